@@ -0,0 +1,297 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Rendering benchmarks draw to an offscreen surface, so no window is needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from cellWorld import World, Cell, Genome, compileGene, compileGenome, generateMergerSponge, resolveMembraneCollisions, cell_size
+import cellRender
+from cellRender import LaserPool, drawCells, viewport, write_text
+
+# Microbenchmarks for the simulation and rendering hot paths. Each benchmark
+# is timed on its own over a grid of sizes and the results are written to a
+# JSON file, so runs on different commits can be compared with --compare:
+#   python bench.py --out before.json
+#   python bench.py --out after.json --compare before.json
+#   python bench.py --only 'cell.*' --repeat 20
+#
+# A benchmark function takes its parameters and returns (setup, run, ops).
+# setup() builds fresh state for one repetition and isn't timed; run(state)
+# is timed and does ops operations, so results are reported per operation.
+
+depths = [3, 4, 5]
+particleCounts = [500, 5000, 20000, 100000]
+genomeLengths = [8, 64, 250, 1000]
+screenSize = (1280, 800)
+
+# Every kind of gene that does something in executeGene, with the doIn state
+# that lets it do it
+executeGenes = ['1;1', '1;3', '2;1', '2;2', '2;3', '3;3', '4;6a', '5;6b', '4;4(3;3.1;1)', '6;7', '6;8']
+insideGenes = ['2;1', '2;2']
+
+_worlds = {}
+_workers = {}  # Process count -> ParticleWorkers, closed once every benchmark has run
+
+def steppedWorld(depth, particles):
+    # Worlds are expensive to build, so each size is built once and shared.
+    # A few steps first, so particles have settled into cells.
+    key = (depth, particles)
+    if key not in _worlds:
+        world = World(3 ** depth, particles, seed=1)
+        for _ in range(5):
+            world.step(1/60)
+        _worlds[key] = world
+    return _worlds[key]
+
+def fillCell(world, cell, food, waste):
+    # Spawned particles are put into whichever cell they land in at the flush
+    for _ in range(food):
+        world.spawnParticle(cell.x + cell.size / 2, cell.y + cell.size / 2, 'food', 2)
+    for _ in range(waste):
+        world.spawnParticle(cell.x + cell.size / 2, cell.y + cell.size / 2, 'waste', 2)
+    world.flush()
+
+def livingCells(world, count):
+    return [cell for cell in world.cells if isinstance(cell, Cell)][:count]
+
+def longGenome(length):
+    # Filler genes with a 3;3 ... 1;1 range spanning nearly the whole genome
+    filler = compileGenome(['6;7', '2;2', '6;8', '4;6a'])
+    genes = [filler[i % len(filler)] for i in range(length)]
+    genes[1], genes[-1] = compileGene('3;3'), compileGene('1;1')
+    health = [50 + (i * 37) % 50 for i in range(length)]
+    return Genome(genes, health)
+
+# Simulation
+
+def benchIntegrate(depth, particles):
+    world = steppedWorld(depth, particles)
+    store = world.store
+    def run(state):
+        store.integrate(world.width, world.height, world.npRandom, world.friction)
+    return None, run, 1
+
+def benchCollisions(depth, particles):
+    world = steppedWorld(depth, particles)
+    def run(state):
+        resolveMembraneCollisions(world)
+    return None, run, 1
+
+def benchStep(depth, particles):
+    world = steppedWorld(depth, particles)
+    def run(state):
+        world.step(1/60)
+    return None, run, 1
+
+def benchParallelStep(particles, processes):
+    # world.step with the particles moved on `processes` processes
+    # Imported here, shared memory needs python 3.8
+    from cellParallel import ParticleWorkers
+    world = steppedWorld(5, particles)
+    if processes not in _workers:
+        _workers[processes] = ParticleWorkers(processes)
+    def run(state):
+        world.workers = _workers[processes]
+        world.step(1/60)
+        world.workers = None
+    return None, run, 1
+
+def benchExecuteGene(gene):
+    cellCount = 64
+    def setup():
+        world = World(3 ** 3, 0, seed=1)
+        cells = livingCells(world, cellCount)
+        for cell in cells:
+            cell.setGenes(compileGenome([gene]))
+            cell.doIn = gene in insideGenes
+            cell.memory = compileGene('6;7')
+            fillCell(world, cell, 10, 10)
+        return world, cells
+    def run(state):
+        world, cells = state
+        for cell in cells:
+            cell.executeGene(world, 0)
+    return setup, run, cellCount
+
+def benchProcessADNA(gene, length):
+    cellCount = 16
+    world = World(3 ** 3, 0, seed=1)
+    genome = longGenome(length)
+    compiled = compileGene(gene)
+    def setup():
+        cells = [Cell(0, 0, genome) for _ in range(cellCount)]
+        for cell in cells:
+            cell.memory = compileGene('6;7')
+        return cells
+    def run(cells):
+        for cell in cells:
+            cell.processADNA(world, compiled.action, compiled)
+    return setup, run, cellCount
+
+def benchInternalParticles(contents, typeFilter):
+    calls = 100
+    world = World(3 ** 3, 0, seed=1)
+    cell = livingCells(world, 1)[0]
+    fillCell(world, cell, contents // 2, contents - contents // 2)
+    def run(state):
+        for _ in range(calls):
+            cell.getInternalParticles(world, typeFilter)
+    return None, run, calls
+
+def benchSponge(depth):
+    def run(state):
+        generateMergerSponge(3 ** depth)
+    return None, run, 1
+
+# Rendering
+
+def benchLasers(lasers):
+    screen = pygame.Surface(screenSize)
+    view = viewport(screen, 0, 0, 1)
+    def setup():
+        pool = LaserPool()
+        rng = np.random.default_rng(1)
+        width, height = screenSize
+        for x, y, tx, ty in rng.random((lasers, 4)) * (width, height, width, height):
+            pool.fire(x, y, tx, ty)
+        return pool
+    def run(pool):
+        pool.draw(screen, 0, 0, 1, view)
+    return setup, run, 1
+
+def benchCells(depth, zoom):
+    screen = pygame.Surface(screenSize)
+    world = steppedWorld(depth, 500)
+    left, top, right, bottom = viewport(screen, 0, 0, zoom)
+    cells = list(world.grid.query(left - cell_size, top - cell_size, right, bottom))
+    detailed = zoom >= cellRender.lod_zoom
+    def run(state):
+        drawCells(screen, cells, world.tick, 0, 0, zoom, detailed)
+    return None, run, 1
+
+def benchText(mode):
+    strings = 100
+    screen = pygame.Surface(screenSize)
+    counter = [0]
+    def run(state):
+        for i in range(strings):
+            if mode == "repeated":
+                write_text(screen, "Cells: 152", 100, 100)
+            else:
+                # Different text every call, like a counter or timer
+                counter[0] += 1
+                write_text(screen, f"Tick: {counter[0] / 60:.2f}", 100, 100)
+    return None, run, strings
+
+def grid(**axes):
+    names = list(axes)
+    combinations = [{}]
+    for name in names:
+        combinations = [dict(params, **{name: value}) for params in combinations for value in axes[name]]
+    return combinations
+
+benchmarks = [
+    ("particles.integrate", benchIntegrate, grid(depth=depths, particles=particleCounts)),
+    ("particles.collisions", benchCollisions, grid(depth=depths, particles=particleCounts)),
+    ("world.step", benchStep, grid(depth=depths, particles=particleCounts)),
+    ("world.step.parallel", benchParallelStep, grid(particles=[20000, 100000], processes=[1, 2, 4, 8])),
+    ("cell.executeGene", benchExecuteGene, grid(gene=executeGenes)),
+    ("cell.processADNA", benchProcessADNA, grid(gene=['4;6a', '5;6b', '4;4(3;3.1;1)', '5;5(3;3.1;1)'], length=genomeLengths)),
+    ("cell.getInternalParticles", benchInternalParticles, grid(contents=[10, 100, 1000], typeFilter=[None, 'food'])),
+    ("layout.sponge", benchSponge, grid(depth=depths)),
+    ("render.lasers", benchLasers, grid(lasers=[10, 100, 1000])),
+    ("render.cells", benchCells, grid(depth=depths, zoom=[1.0, 0.5, 0.25])),
+    ("render.text", benchText, grid(mode=["repeated", "changing"])),
+]
+
+def timeBenchmark(function, params, repeat):
+    setup, run, ops = function(**params)
+    run(setup() if setup else None)  # Warm up caches (sprite atlas, fonts, ...)
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        run(state)
+        times.append((time.perf_counter() - start) / ops * 1e6)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "min_us": min(times),
+        "median_us": statistics.median(times),
+        "mean_us": statistics.mean(times),
+    }
+
+def gitCommit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def describe(params):
+    return " ".join(f"{name}={value}" for name, value in params.items())
+
+def runBenchmarks(patterns, repeat):
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    results = []
+    for name, function, paramGrid in benchmarks:
+        if patterns and not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        for params in paramGrid:
+            result = {"name": name, "params": params, **timeBenchmark(function, params, repeat)}
+            results.append(result)
+            print(f"{name:26} {describe(params):32} {result['median_us']:12.1f} us/op")
+    for workers in _workers.values():
+        workers.close()
+    pygame.quit()
+    return results
+
+def compare(results, basePath):
+    with open(basePath) as baseFile:
+        base = json.load(baseFile)
+    baseTimes = {(result["name"], json.dumps(result["params"], sort_keys=True)): result["median_us"] for result in base["results"]}
+    print(f"\nCompared with {basePath} ({base.get('commit')}), median time now / before:")
+    for result in results:
+        before = baseTimes.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if before:
+            print(f"{result['name']:26} {describe(result['params']):32} {result['median_us'] / before:8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the simulation and rendering hot paths")
+    parser.add_argument("--out", default="bench_results.json", help="JSON file to write the results to")
+    parser.add_argument("--only", action="append", metavar="PATTERN", help="only run benchmarks whose name matches (glob, repeatable)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repetitions of each benchmark")
+    parser.add_argument("--compare", metavar="PATH", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = runBenchmarks(args.only, args.repeat)
+    report = {
+        "commit": gitCommit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=1)
+    print(f"Wrote {len(results)} results to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import json
+import math
+import os
+
+import numpy as np
+
+from cellWorld import World, Cell, Wall, Genome, Particle, UnboundGeneticMaterial, ParticleStore, compileGene, compileGenome, UGM
+
+# Binary checkpoints of a whole world. A file is:
+#   MAGIC, an 8 byte header length, the JSON header, then one raw array per
+#   column, each starting on a 64 byte boundary.
+# The header holds the scalar state (settings, tick, both RNG states) and,
+# for every array, its dtype, length and offset. Because the arrays are
+# stored as-is they can be memory-mapped straight out of the file.
+#
+# Cells, genomes and particles are all stored column-wise. Genomes and the
+# genes of UGMs are ragged, so they're flattened into one array of indices
+# into a table of gene strings plus an offsets array (genome i is
+# geneIndex[geneOffsets[i]:geneOffsets[i + 1]]).
+
+MAGIC = b"CELLCKP1"
+ALIGN = 64
+
+def _ragged(lists, dtype):
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(items) for items in lists])
+    flat = np.fromiter((item for items in lists for item in items), dtype=dtype, count=int(offsets[-1]))
+    return offsets, flat
+
+def saveCheckpoint(world, path):
+    # Written to a temporary file first so a crash never leaves a broken checkpoint
+    world.wakeAll()
+    world.flush()
+    store = world.store
+    n = store.count
+
+    geneTable = {}
+    def geneId(gene):
+        return geneTable.setdefault(gene.text, len(geneTable))
+
+    cells = world.cells
+    rowOf = {id(particle): row for row, particle in enumerate(store.proxies)}
+    arrays = {
+        "cellKind": np.array([isinstance(cell, Cell) for cell in cells], dtype=np.int8),
+        "cellX": np.array([cell.x for cell in cells], dtype=np.int64),
+        "cellY": np.array([cell.y for cell in cells], dtype=np.int64),
+        "cellSize": np.array([cell.size for cell in cells], dtype=np.int64),
+        "cellHandle": np.array([cell.handle for cell in cells], dtype=np.int64),
+        "membraneHealth": np.array([cell.membraneHealth for cell in cells], dtype=np.int64),
+    }
+    living = [cell for cell in cells if isinstance(cell, Cell)]
+    arrays["doIn"] = np.array([cell.doIn for cell in living], dtype=bool)
+    arrays["onGeneNumber"] = np.array([cell.onGeneNumber for cell in living], dtype=np.int64)
+    arrays["geneBrightness"] = np.array([cell.geneBrightness for cell in living], dtype=np.int64)
+    arrays["energy"] = np.array([cell.energy for cell in living], dtype=np.int64)
+    arrays["myTick"] = np.array([cell.myTick for cell in living], dtype=np.int64)
+    arrays["memory"] = np.array([-1 if cell.memory is None else geneId(cell.memory) for cell in living], dtype=np.int64)
+    arrays["geneOffsets"], arrays["geneIndex"] = _ragged([[geneId(gene) for gene in cell.genes] for cell in living], np.int32)
+    _, arrays["geneHealth"] = _ragged([cell.geneHealth for cell in living], np.int64)
+    # Contents keep their order, it decides which particle a gene picks
+    arrays["contentsOffsets"], arrays["contentsRows"] = _ragged([[rowOf[id(particle)] for particle in cell.contents] for cell in living], np.int64)
+
+    for name in ("x", "y", "velx", "vely", "type", "radius", "bx", "by", "handle"):
+        arrays[name] = getattr(store, name)[:n]
+    ugmRows = np.flatnonzero(store.type[:n] == UGM)
+    ugms = [store.proxies[row] for row in ugmRows]
+    arrays["ugmRows"] = ugmRows
+    arrays["ugmCreationTime"] = np.array([ugm.creation_time for ugm in ugms], dtype=np.float64)
+    arrays["ugmHalfLife"] = np.array([ugm.half_life for ugm in ugms], dtype=np.float64)
+    arrays["ugmGeneOffsets"], arrays["ugmGeneIndex"] = _ragged([[geneId(gene) for gene in ugm.genes] for ugm in ugms], np.int32)
+
+    randomState = world.random.getstate()
+    header = {
+        "version": 1,
+        "spongeSize": world.spongeSize,
+        "particleCount": world.particleCount,
+        "seed": world.seed,
+        "genes": [gene.text for gene in world.genes],
+        "foodShare": world.foodShare,
+        "friction": world.friction,
+        "damping": world.damping,
+        "width": world.width,
+        "height": world.height,
+        "tick": world.tick,
+        "timeMs": world.timeMs,
+        "foodWasteRatio": world.foodWasteRatio,
+        "nextCellHandle": world.nextCellHandle,
+        "nextHandle": store.nextHandle,
+        "random": [randomState[0], list(randomState[1]), randomState[2]],
+        "npRandom": world.npRandom.bit_generator.state,
+        "geneTable": list(geneTable),
+        "arrays": {},
+    }
+
+    # Offsets are relative to the first 64 byte boundary after the header
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header["arrays"][name] = [array.dtype.str, len(array), offset]
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    headerBytes = json.dumps(header).encode()
+    dataStart = -(-(len(MAGIC) + 8 + len(headerBytes)) // ALIGN) * ALIGN
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as checkpoint:
+        checkpoint.write(MAGIC)
+        checkpoint.write(len(headerBytes).to_bytes(8, "little"))
+        checkpoint.write(headerBytes)
+        for name, array in arrays.items():
+            checkpoint.seek(dataStart + header["arrays"][name][2])
+            checkpoint.write(array.tobytes())
+        checkpoint.truncate(dataStart + offset)
+    os.replace(temporary, path)
+
+def readCheckpoint(path):
+    # Header plus read-only arrays memory-mapped from the file, for looking
+    # at a checkpoint without building a world from it
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+    headerLength = int.from_bytes(bytes(data[len(MAGIC):len(MAGIC) + 8]), "little")
+    headerEnd = len(MAGIC) + 8 + headerLength
+    header = json.loads(bytes(data[len(MAGIC) + 8:headerEnd]))
+    if header.get("version") != 1:
+        raise ValueError(f"Unsupported checkpoint version in {path}")
+
+    dataStart = -(-headerEnd // ALIGN) * ALIGN
+    arrays = {}
+    for name, (dtype, length, offset) in header["arrays"].items():
+        dtype = np.dtype(dtype)
+        start = dataStart + offset
+        arrays[name] = data[start:start + length * dtype.itemsize].view(dtype)
+    return header, arrays
+
+def loadCheckpoint(path):
+    header, arrays = readCheckpoint(path)
+    world = World(header["spongeSize"], header["particleCount"], header["seed"],
+                  genes=compileGenome(header["genes"]), foodShare=header["foodShare"],
+                  friction=header["friction"], damping=header["damping"], populate=False)
+    world.width, world.height = header["width"], header["height"]
+    world.tick = header["tick"]
+    world.timeMs = header["timeMs"]
+    world.foodWasteRatio = header["foodWasteRatio"]
+    version, internal, gauss = header["random"]
+    world.random.setstate((version, tuple(internal), gauss))
+    world.npRandom.bit_generator.state = header["npRandom"]
+    genes = [compileGene(text) for text in header["geneTable"]]
+
+    # Particles: copy the columns into a store of our own, then hand out proxies
+    n = len(arrays["x"])
+    capacity = 1024
+    while capacity < n:
+        capacity *= 2
+    store = world.store = ParticleStore(capacity)
+    for name in ("x", "y", "velx", "vely", "type", "radius", "bx", "by", "handle"):
+        getattr(store, name)[:n] = arrays[name]
+    store.px[:n] = arrays["x"]
+    store.py[:n] = arrays["y"]
+    store.alive[:n] = True
+    store.count = n
+    store.nextHandle = header["nextHandle"]
+    store._growHandles(store.nextHandle)
+    store.rowOf[store.handle[:n]] = np.arange(n)
+    store.recount()
+
+    proxies = [None] * n
+    ugmGeneOffsets, ugmGeneIndex = arrays["ugmGeneOffsets"].tolist(), arrays["ugmGeneIndex"].tolist()
+    for i, row in enumerate(arrays["ugmRows"].tolist()):
+        ugm = UnboundGeneticMaterial([genes[index] for index in ugmGeneIndex[ugmGeneOffsets[i]:ugmGeneOffsets[i + 1]]])
+        ugm.creation_time = arrays["ugmCreationTime"][i].item()
+        ugm.half_life = arrays["ugmHalfLife"][i].item()
+        proxies[row] = ugm
+    for row, handle in enumerate(arrays["handle"].tolist()):
+        particle = proxies[row]
+        if particle is None:
+            particle = proxies[row] = Particle()
+        particle.store = store
+        particle.row = row
+        particle.handle = handle
+    store.proxies = proxies
+
+    # Cells, in their original order, with their genomes and contents
+    world.nextCellHandle = header["nextCellHandle"]
+    geneOffsets, geneIndex = arrays["geneOffsets"].tolist(), arrays["geneIndex"].tolist()
+    geneHealth = arrays["geneHealth"].tolist()
+    contentsOffsets, contentsRows = arrays["contentsOffsets"].tolist(), arrays["contentsRows"].tolist()
+    columns = {name: arrays[name].tolist() for name in ("cellX", "cellY", "cellSize", "cellHandle", "membraneHealth", "memory",
+                                                         "doIn", "onGeneNumber", "geneBrightness", "energy", "myTick")}
+    living = 0
+    for i, isCell in enumerate(arrays["cellKind"].tolist()):
+        x, y = columns["cellX"][i], columns["cellY"][i]
+        cell = Cell(x, y, ()) if isCell else Wall(x, y)
+        cell.size = columns["cellSize"][i]
+        cell.handle = columns["cellHandle"][i]
+        cell.membraneHealth = columns["membraneHealth"][i]
+        if isCell:
+            start, end = geneOffsets[living], geneOffsets[living + 1]
+            cell.genome = Genome([genes[index] for index in geneIndex[start:end]], geneHealth[start:end])
+            memory = columns["memory"][living]
+            cell.memory = genes[memory] if memory >= 0 else None
+            cell.doIn = columns["doIn"][living]
+            cell.onGeneNumber = columns["onGeneNumber"][living]
+            cell.geneBrightness = columns["geneBrightness"][living]
+            cell.energy = columns["energy"][living]
+            cell.myTick = columns["myTick"][living]
+            for row in contentsRows[contentsOffsets[living]:contentsOffsets[living + 1]]:
+                proxies[row].container = cell
+                store.inside[row] = cell.handle
+                cell.contents[proxies[row]] = None
+            living += 1
+        world.addCell(cell)
+    world.geneTicks = [math.floor(world.tick)]
+    return world
+
+class Autosave:
+    # Checkpoints a long run every `every` steps. Call after each step.
+    def __init__(self, path, every=36000):
+        self.path = path
+        self.every = every
+        self.steps = 0
+
+    def __call__(self, world):
+        self.steps += 1
+        if self.steps % self.every == 0:
+            saveCheckpoint(world, self.path)
@@ -0,0 +1,272 @@
+import multiprocessing
+import os
+from multiprocessing import resource_tracker, shared_memory
+from types import SimpleNamespace
+
+import numpy as np
+
+from cellWorld import DenseGrid, applyContacts, cell_size, containmentChanges, integrateParticles, membraneContacts, resolveMembraneCollisions
+
+# Moves a World's particles (membrane collisions, integration and working out
+# which cell each one is in, the array-heavy half of World.step) on several
+# processes at once:
+#   with ParticleWorkers(8) as workers:
+#       world.workers = workers
+#       runHeadless(steps, world=world)
+#
+# The ParticleStore columns and the collision grid live in shared memory, so
+# every process works on the same arrays and only block names and the
+# results go through the pipes.
+#
+# The world is cut into vertical strips of bucket columns with about the
+# same number of particles in each, redrawn every step. Each process moves
+# the particles in its strip and reads the membranes up to one bucket past
+# either side of it (the halo the 3x3 collision neighbourhood needs)
+# straight from the shared grid. A particle that crosses into the next strip
+# belongs to that strip from the next step on. Processes only write their
+# own particles' rows, so nothing needs locking.
+#
+# Results match a single process exactly. Every particle's random nudge is
+# drawn from world.npRandom up front, in the order ParticleStore.integrate
+# draws them, and UGM injections and membrane damage are applied afterwards
+# in the order resolveMembraneCollisions applies them, followed by the
+# particles that changed cell in row order. Cell updates, those containment
+# callbacks, UGM decay and transmutation stay on the main process: they draw
+# from the world's random generators or run Python per object in a fixed
+# order, so they can't be split up without changing every seeded run. How
+# far a world speeds up is bounded by how much of its step they take; it
+# pays off when particles far outnumber cells.
+
+min_particles = 5000  # Fewer than this and the pipes cost more than they save
+particleColumns = ("x", "y", "velx", "vely", "type", "radius", "bx", "by", "inside", "alive")
+
+class SharedArrays:
+    # Makes NumPy arrays in shared memory blocks that other processes can map
+    # by name. Usable as a ParticleStore's allocate.
+    def __init__(self):
+        self.blocks = {}  # Block name -> (SharedMemory, array)
+        self.names = {}  # id(array) -> block name
+        self._closing = []  # Released blocks something still had a view of
+
+    def __call__(self, shape, dtype=float):
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.fill(0)
+        self.blocks[block.name] = (block, array)
+        self.names[id(array)] = block.name
+        return array
+
+    def share(self, array):
+        shared = self(array.shape, array.dtype)
+        shared[...] = array
+        return shared
+
+    def describe(self, array):
+        # What another process needs to map array
+        return self.names[id(array)], array.shape, array.dtype.str
+
+    def release(self, keep):
+        # Free every block whose array isn't in keep
+        keep = {id(array) for array in keep}
+        for name in [name for name, (block, array) in self.blocks.items() if id(array) not in keep]:
+            block, array = self.blocks.pop(name)
+            del self.names[id(array)], array
+            block.unlink()
+            self._closing.append(block)
+        closing, self._closing = self._closing, []
+        for block in closing:
+            try:
+                block.close()
+            except BufferError:
+                self._closing.append(block)
+
+def _attach(name):
+    # Before Python 3.13 mapping a block registers it with the resource
+    # tracker as if this process had made it, and it would be unlinked from
+    # under the main process when this one exits
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+def moveStrip(store, count, dense, strip, noiseX, noiseY, index, width, height, friction):
+    # Collide, integrate and re-bucket the rows in strip `index`. Returns
+    # what membraneContacts and containmentChanges found, for the main
+    # process to apply.
+    rows = np.flatnonzero(strip[:count] == index)
+    if len(dense.x):
+        contacts = membraneContacts(store, dense, rows)
+    else:
+        contacts = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.int64))
+    x, y, velx, vely = store.x[rows], store.y[rows], store.velx[rows], store.vely[rows]
+    integrateParticles(x, y, velx, vely, store.radius[rows], width, height, friction, noiseX[rows], noiseY[rows])
+    store.x[rows], store.y[rows], store.velx[rows], store.vely[rows] = x, y, velx, vely
+    return contacts, containmentChanges(store, dense, rows[store.alive[rows]])
+
+def _worker(connection):
+    # Each helper process runs this until it's sent None
+    mapped = {}  # Block name -> SharedMemory
+
+    def view(description):
+        name, shape, dtype = description
+        if name not in mapped:
+            mapped[name] = _attach(name)
+        return np.ndarray(shape, dtype, buffer=mapped[name].buf)
+
+    def run(job):
+        store = SimpleNamespace(**{name: view(description) for name, description in job["columns"].items()})
+        dense = DenseGrid.fromArrays(*job["origin"], **{name: view(description) for name, description in job["grid"].items()})
+        return moveStrip(store, job["count"], dense, view(job["strip"]), view(job["noiseX"]), view(job["noiseY"]),
+                         job["index"], job["width"], job["height"], job["friction"])
+
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+        # Blocks the main process has moved on from are no longer named
+        used = {description[0] for description in [*job["columns"].values(), *job["grid"].values(),
+                                                   job["strip"], job["noiseX"], job["noiseY"]]}
+        for name in [name for name in mapped if name not in used]:
+            mapped.pop(name).close()
+        try:
+            connection.send(run(job))
+        except Exception as error:
+            connection.send(error)
+    for block in mapped.values():
+        block.close()
+
+class ParticleWorkers:
+    # processes counts the main process, which moves a strip of its own while
+    # it waits for the others. Helpers are spawned rather than forked so they
+    # don't inherit a window or the simulation thread.
+    def __init__(self, processes=None, minParticles=min_particles):
+        self.processes = processes or os.cpu_count() or 1
+        self.minParticles = minParticles
+        self.arrays = SharedArrays()
+        self.connections = []
+        self.helpers = []
+        context = multiprocessing.get_context("spawn")
+        for i in range(1, self.processes):
+            ours, theirs = context.Pipe()
+            helper = context.Process(target=_worker, args=(theirs,), name=f"particles-{i}", daemon=True)
+            helper.start()
+            theirs.close()
+            self.connections.append(ours)
+            self.helpers.append(helper)
+        self._store = None  # Store whose columns were moved into shared memory
+        self._dense = None  # DenseGrid the shared grid was copied from
+        self._denseVersion = 0  # Its version at the time
+        self._grid = {}
+        self._origin = (0, 0)
+        self.strip = self.noiseX = self.noiseY = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass  # It's already gone
+        for helper in self.helpers:
+            helper.join()
+        self.connections, self.helpers = [], []
+        if self._store is not None and self._store.allocate is self.arrays:
+            self._store.reallocate(np.zeros)
+        self._store = self._dense = None
+        self._grid = {}
+        self.strip = self.noiseX = self.noiseY = None
+        self.arrays.release(())
+
+    def _share(self, store, dense, count):
+        if store.allocate is not self.arrays:
+            store.reallocate(self.arrays)
+            self._store = store
+        if dense is self._dense and dense.version != self._denseVersion and len(dense.x) == len(self._grid["x"]):
+            # Cells only died since: the same solids, fewer of them looked up
+            self._grid["lookup"][...] = dense.lookup
+            self._denseVersion = dense.version
+        elif dense is not self._dense or dense.version != self._denseVersion:
+            self._grid = {name: self.arrays.share(getattr(dense, name)) for name in DenseGrid.arrays}
+            self._origin = (int(dense.originX), int(dense.originY))
+            self._dense, self._denseVersion = dense, dense.version
+        if self.strip is None or len(self.strip) < count:
+            capacity = len(store.x)
+            self.strip = self.arrays(capacity, dtype=np.int32)
+            self.noiseX = self.arrays(capacity)
+            self.noiseY = self.arrays(capacity)
+        self.arrays.release([getattr(store, name) for name in store.columns] + list(self._grid.values())
+                            + [self.strip, self.noiseX, self.noiseY])
+
+    def _cut(self, x, width):
+        # Strip of every row, each strip a run of bucket columns holding
+        # about the same number of particles. Particles in the wrap margin,
+        # or anywhere else off the world (a UGM placed outside it, which
+        # wraps on its next move), count as column -1 or one past the last.
+        # Any strip can move any particle, this only balances the work.
+        columns = np.clip(x // cell_size, -1, width // cell_size + 1).astype(np.int64) + 1
+        cumulative = np.cumsum(np.bincount(columns))
+        strips = len(self.connections) + 1
+        edges = np.searchsorted(cumulative, len(x) * np.arange(1, strips) / strips) + 1
+        return np.searchsorted(edges, columns, side="right")
+
+    def moveParticles(self, world):
+        # Stands in for resolveMembraneCollisions followed by
+        # ParticleStore.integrate. Returns the UGMs used up, and the
+        # containmentChanges for World._updateContainment (None if it was
+        # all done here on the main process, which leaves them to it).
+        store = world.store
+        n = store.count
+        if n < self.minParticles or not self.connections:
+            injected = resolveMembraneCollisions(world)
+            store.integrate(world.width, world.height, world.npRandom, world.friction)
+            return injected, None
+
+        dense = world.grid.dense()
+        self._share(store, dense, n)
+        self.noiseX[:n] = world.npRandom.uniform(-0.02, 0.02, n)
+        self.noiseY[:n] = world.npRandom.uniform(-0.02, 0.02, n)
+        self.strip[:n] = self._cut(store.x[:n], world.width)
+
+        describe = self.arrays.describe
+        job = {
+            "columns": {name: describe(getattr(store, name)) for name in particleColumns},
+            "grid": {name: describe(array) for name, array in self._grid.items()},
+            "origin": self._origin,
+            "strip": describe(self.strip),
+            "noiseX": describe(self.noiseX),
+            "noiseY": describe(self.noiseY),
+            "count": n,
+            "width": world.width,
+            "height": world.height,
+            "friction": world.friction,
+        }
+        for index, connection in enumerate(self.connections, 1):
+            connection.send(dict(job, index=index))
+        shared = DenseGrid.fromArrays(*self._origin, **self._grid)
+        results = [moveStrip(store, n, shared, self.strip, self.noiseX, self.noiseY, 0, world.width, world.height, world.friction)]
+        for connection in self.connections:
+            result = connection.recv()
+            if isinstance(result, Exception):
+                raise result
+            results.append(result)
+
+        # Back into the order one process would have found them in: damage
+        # summed over strips (the halos overlap), injections by round and
+        # row, containment changes by row
+        contacts = [result[0] for result in results]
+        hitSolids, inverse = np.unique(np.concatenate([contact[0] for contact in contacts]), return_inverse=True)
+        hits = np.bincount(inverse, weights=np.concatenate([contact[1] for contact in contacts])).astype(np.int64)
+        infections = np.concatenate([contact[2] for contact in contacts])
+        infections = infections[np.lexsort((infections[:, 1], infections[:, 0]))]
+        rows = np.concatenate([result[1][0] for result in results])
+        solids = np.concatenate([result[1][1] for result in results])
+        order = np.argsort(rows)
+        return applyContacts(store, dense, hitSolids, hits, infections), (rows[order], solids[order])
@@ -0,0 +1,102 @@
+import json
+import time
+
+import numpy as np
+
+# Per-phase frame timing. A frame is split into named phases by calling
+# mark(name) at the end of each one: everything since the previous mark (or
+# the start of the frame) is charged to that phase. The last `frames` frames
+# are kept in ring buffers, for the in-game overlay and for exporting as a
+# Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+#
+# Nothing is timed while disabled, and marks return straight away, so the
+# calls can stay in the main loop.
+#
+# Each thread that's profiled gets its own Profiler (the window's frames and
+# the simulation thread's steps). Times are all measured from the same
+# epoch, so their traces line up when exported together.
+
+phases = ("wait", "input", "draw", "lasers", "panels", "overlay", "flip")
+epoch = time.perf_counter()
+
+class Profiler:
+    def __init__(self, frames=600, phases=phases, enabled=False, name="main"):
+        self.phases = phases
+        self.index = {name: i for i, name in enumerate(phases)}
+        self.enabled = enabled
+        self.name = name
+        self.frames = 0  # Frames recorded so far, the ring holds the last len(self.frameStart)
+        self.frameStart = np.zeros(frames)  # Seconds since epoch
+        self.frameLength = np.zeros(frames)
+        self.start = np.zeros((frames, len(phases)))
+        self.duration = np.zeros((frames, len(phases)))
+        self._open = False  # Between beginFrame and endFrame
+        self._row = 0
+        self._last = 0.0
+
+    def recorded(self):
+        # Frames currently held in the ring
+        return min(self.frames, len(self.frameStart))
+
+    def beginFrame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._row = self.frames % len(self.frameStart)
+        self.frameStart[self._row] = now - epoch
+        self.start[self._row] = 0
+        self.duration[self._row] = 0
+        self._last = now
+        self._open = True
+
+    def mark(self, phase):
+        if not self.enabled or not self._open:
+            return
+        now = time.perf_counter()
+        i = self.index[phase]
+        if not self.duration[self._row, i]:
+            self.start[self._row, i] = self._last - epoch
+        self.duration[self._row, i] += now - self._last
+        self._last = now
+
+    def endFrame(self):
+        if not self.enabled or not self._open:
+            return
+        self.frameLength[self._row] = time.perf_counter() - epoch - self.frameStart[self._row]
+        self.frames += 1
+        self._open = False
+
+    def toggle(self):
+        # A fresh start when switched back on, rather than a gap in the ring.
+        # Switching off keeps what was recorded, for the trace export.
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.frames = 0
+        self._open = False
+
+    def recent(self, count=None):
+        # Phase durations of the last `count` frames in ms, oldest first
+        count = min(count or self.recorded(), self.recorded())
+        rows = (self.frames - count + np.arange(count)) % len(self.frameStart)
+        return self.duration[rows] * 1000
+
+    def traceEvents(self, tid=0):
+        # Chrome trace events: one complete ("X") event per frame with its
+        # phases nested inside, timestamps in microseconds
+        events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": self.name}}]
+        for row in (self.frames - self.recorded() + np.arange(self.recorded())) % len(self.frameStart):
+            events.append({"name": "frame", "ph": "X", "pid": 0, "tid": tid,
+                           "ts": self.frameStart[row] * 1e6, "dur": self.frameLength[row] * 1e6})
+            for i, phase in enumerate(self.phases):
+                if self.duration[row, i]:
+                    events.append({"name": phase, "ph": "X", "pid": 0, "tid": tid,
+                                   "ts": self.start[row, i] * 1e6, "dur": self.duration[row, i] * 1e6})
+        return events
+
+def exportTrace(path, *profilers):
+    # One trace-event JSON file with each profiler as its own thread
+    events = []
+    for tid, profiler in enumerate(profilers):
+        events.extend(profiler.traceEvents(tid))
+    with open(path, "w") as trace:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace)
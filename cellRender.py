@@ -0,0 +1,483 @@
+import pygame
+import math
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+
+from cellWorld import Cell, Wall, FOOD, UGM, cell_size
+
+# Below this zoom cells are drawn as flat tiles and food/waste as a density
+# heatmap, since the detail would be smaller than a pixel anyway
+lod_zoom = 0.4
+heatmap_bin = 4  # Heatmap cell size in screen pixels
+health_step = 20  # Gene health is drawn in steps of this much, so cells can share sprites
+
+geneColors = [(40, 40, 40), (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255), (180, 100, 220), (83, 195, 182)]
+
+def is_visible_on_screen(x, y, width, height, screen_width, screen_height):
+    return not (x > screen_width or x + width < 0 or y > screen_height or y + height < 0)
+
+class TextCache:
+    # Fonts are built once per size, and rendered text is kept in an LRU keyed
+    # by (text, size, colour). Strings that change every frame (counters,
+    # timers) just pass through the LRU; rendering them whole with a cached
+    # font is cheaper than stitching glyphs together and keeps the kerning.
+    def __init__(self, maxEntries=512):
+        self.maxEntries = maxEntries
+        self.fonts = {}
+        self.rendered = OrderedDict()
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        surface = self.rendered.get(key)
+        if surface is None:
+            surface = self.rendered[key] = self.font(size).render(text, True, color)
+            if len(self.rendered) > self.maxEntries:
+                self.rendered.popitem(last=False)
+        else:
+            self.rendered.move_to_end(key)
+        return surface
+
+textCache = TextCache()
+
+def write_text(screen, text, x, y, color=(0, 0, 0), font_size=20, left=False):
+    if not is_visible_on_screen(x - 50, y - 10, 100, 20, screen.get_width(), screen.get_height()):
+        return
+    text_surface = textCache.render(text, font_size, color)
+    if left:
+        text_rect = text_surface.get_rect(topleft=(x, y))
+    else:
+        text_rect = text_surface.get_rect(center=(x, y))
+    screen.blit(text_surface, text_rect)
+
+# Shared waveform table for laser beams: progress along the beam, the
+# envelope that pins both ends down, and the wave split into sin/cos parts so
+# a laser's phase only costs one sin and one cos per frame
+laser_points = 50
+laser_progress = np.linspace(0, 1, laser_points)
+laser_envelope = np.sin(laser_progress * math.pi)  # Creates a smooth curve that peaks in middle
+laser_wave_sin = np.sin(laser_progress * 6 * math.pi) * laser_envelope
+laser_wave_cos = np.cos(laser_progress * 6 * math.pi) * laser_envelope
+
+class LaserPool:
+    # Every laser on screen lives in one slot of these arrays. Each frame a
+    # laser thins by 0.2 and its slot is freed once it bottoms out at 0.1, to
+    # be reused by the next laser fired.
+    def __init__(self, capacity=64):
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.tx = np.zeros(capacity)
+        self.ty = np.zeros(capacity)
+        self.thickness = np.zeros(capacity)
+        self.amplitude = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.active))
+
+    def _grow(self):
+        capacity = len(self.x)
+        for name in ("x", "y", "tx", "ty", "thickness", "amplitude", "active"):
+            old = getattr(self, name)
+            new = np.zeros(capacity * 2, dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self.free.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    def fire(self, x, y, targetX, targetY, thickness=5, amplitude=2):
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.x[slot], self.y[slot] = x, y
+        self.tx[slot], self.ty[slot] = targetX, targetY
+        self.thickness[slot] = thickness
+        self.amplitude[slot] = amplitude
+        self.active[slot] = True
+
+    def draw(self, screen, offset_x, offset_y, zoom, view=None):
+        # view is the world rectangle on screen, beams entirely outside it
+        # still age but aren't drawn
+        slots = np.flatnonzero(self.active)
+        if not len(slots):
+            return
+        thickness = np.maximum(0.1, self.thickness[slots] - 0.2)
+        self.thickness[slots] = thickness
+
+        finished = thickness == 0.1
+        self.active[slots[finished]] = False
+        self.free.extend(slots[finished].tolist())
+
+        dx = self.tx[slots] - self.x[slots]
+        dy = self.ty[slots] - self.y[slots]
+        distance = np.hypot(dx, dy)
+        drawn = ~finished & (distance > 0)
+        if view is not None:
+            left, top, right, bottom = view
+            reach = self.amplitude[slots] + thickness
+            drawn &= (np.maximum(self.x[slots], self.tx[slots]) + reach >= left) & (np.minimum(self.x[slots], self.tx[slots]) - reach <= right)
+            drawn &= (np.maximum(self.y[slots], self.ty[slots]) + reach >= top) & (np.minimum(self.y[slots], self.ty[slots]) - reach <= bottom)
+        if not drawn.any():
+            return
+        slots, thickness = slots[drawn], thickness[drawn]
+        dx, dy, distance = dx[drawn], dy[drawn], distance[drawn]
+
+        # sin(wave + 2 * thickness) expanded so the table can be reused
+        phase = thickness[:, None] * 2
+        wave_offset = (laser_wave_sin * np.cos(phase) + laser_wave_cos * np.sin(phase)) * self.amplitude[slots, None]
+        perpendicular_x = (-dy / distance)[:, None]
+        perpendicular_y = (dx / distance)[:, None]
+        points_x = self.x[slots, None] + dx[:, None] * laser_progress + perpendicular_x * wave_offset
+        points_y = self.y[slots, None] + dy[:, None] * laser_progress + perpendicular_y * wave_offset
+        points = np.stack(((points_x + offset_x) * zoom, (points_y + offset_y) * zoom), axis=2)
+
+        widths = np.maximum(1, (thickness * zoom).astype(int)).tolist()
+        for line, width in zip(points.tolist(), widths):
+            pygame.draw.lines(screen, (255, 0, 0), False, line, width)
+
+@lru_cache(maxsize=4096)
+def _calculate_gene_points(pos_x, pos_y, gene_size, angle):
+    half_size = gene_size / 4
+    return [
+             (pos_x - half_size * math.cos(angle) + half_size * math.sin(angle),
+              pos_y - half_size * math.sin(angle) - half_size * math.cos(angle)),
+             (pos_x + half_size * math.cos(angle) + half_size * math.sin(angle),
+              pos_y + half_size * math.sin(angle) - half_size * math.cos(angle)),
+             (pos_x + half_size * math.cos(angle) - half_size * math.sin(angle),
+              pos_y + half_size * math.sin(angle) + half_size * math.cos(angle)),
+             (pos_x - half_size * math.cos(angle) - half_size * math.sin(angle),
+              pos_y - half_size * math.sin(angle) + half_size * math.cos(angle))
+    ]
+
+def _gene_polygons(center_x, center_y, count, i, zoom):
+    # Primary and secondary polygon for gene i of count around a cell centre
+    gene_radius = 6 * zoom
+    gene_size = min(6 * zoom, 24 * zoom / count)
+    angle = math.pi / 2 + (2 * math.pi * i) / count  # Start from top
+
+    pos_x = center_x + gene_radius * math.cos(angle)
+    pos_y = center_y + gene_radius * math.sin(angle)
+    primary = _calculate_gene_points(pos_x, pos_y, gene_size, angle)
+
+    offset_x = gene_size * math.cos(angle + math.pi) / 2
+    offset_y = gene_size * math.sin(angle + math.pi) / 2
+    secondary = _calculate_gene_points(pos_x + offset_x, pos_y + offset_y, gene_size, angle)
+    return primary, secondary
+
+def _dimmed(color, health):
+    return tuple(max(0, min(255, c - int(255 - health*2.55))) for c in color)
+
+def _shownHealth(health):
+    # Rounded up to the step, so a gene only dims once it's lost a step's worth
+    return -(-min(100, max(0, health)) // health_step) * health_step
+
+class CellAtlas:
+    # Pre-rendered cell and wall sprites. Everything about a cell except the
+    # rotating selector and the highlighted gene only changes with its genes,
+    # gene health (in health_step steps), membrane width, doIn or the
+    # on-screen size, so each combination is drawn once and blitted from then
+    # on. Least recently used sprites are dropped past maxSprites.
+    def __init__(self, maxSprites=4096):
+        self.maxSprites = maxSprites
+        self.sprites = OrderedDict()
+        self._genomeKeys = WeakKeyDictionary()  # Genome -> (version, genes and shown health)
+
+    def _get(self, key, render):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = render()
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.maxSprites:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+
+    def cellSprite(self, cell, scaled_size):
+        # Sprites are drawn at the zoom that gives exactly scaled_size pixels,
+        # so every zoom rounding to the same size shares them
+        zoom = scaled_size / cell.size
+        membrane_width = round(cell.membraneHealth / 60 * zoom)
+        genes, health = self._genomeKey(cell.genome)
+        key = (genes, health, membrane_width, cell.doIn, scaled_size)
+        return self._get(key, lambda: self._renderCell(genes, health, membrane_width, cell.doIn, scaled_size, zoom))
+
+    def _genomeKey(self, genome):
+        # Only worked out again when the genome's version moves on
+        entry = self._genomeKeys.get(genome)
+        if entry is None or entry[0] != genome.version:
+            entry = self._genomeKeys[genome] = (genome.version, (tuple(genome.genes), tuple(_shownHealth(health) for health in genome.health)))
+        return entry[1]
+
+    def tileSprite(self, scaled_size, color):
+        def render():
+            sprite = pygame.Surface((scaled_size + 2, scaled_size + 2))
+            sprite.fill(color)
+            return sprite
+        return self._get(("tile", scaled_size, color), render)
+
+    def wallSprite(self, scaled_size):
+        return self.tileSprite(scaled_size, (0, 0, 0))
+
+    def _renderCell(self, genes, health, membrane_width, doIn, scaled_size, zoom):
+        sprite = pygame.Surface((scaled_size + 2, scaled_size + 2))
+        center_x = center_y = scaled_size // 2 + 1
+
+        # Draw cell body
+        sprite.fill((210, 180, 140))
+
+        # Draw cell membrane
+        pygame.draw.rect(sprite, (245, 222, 179), sprite.get_rect(), int(membrane_width))
+
+        # Draw inside/outside indicator (doIn)
+        color = (127,127,127) if doIn else (220,220,220)
+        pygame.draw.polygon(sprite, color, ((center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.45 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.45 + scaled_size//1.7)))
+
+        pygame.draw.circle(sprite, (255, 255, 255), (center_x, center_y), scaled_size // 6, math.floor(scaled_size // 30))
+
+        for i, gene in enumerate(genes):
+            primary, secondary = _gene_polygons(center_x, center_y, len(genes), i, zoom)
+            pygame.draw.polygon(sprite, _dimmed(geneColors[gene.action], health[i]), primary)
+            pygame.draw.polygon(sprite, geneColors[gene.target], secondary)
+        return sprite
+
+_atlas = CellAtlas()
+
+def drawCellOverlay(screen, cell, tick, scaled_x, scaled_y, scaled_size):
+    # The per-frame part of a cell: the selector and the gene being executed
+    genes = cell.genes
+    if not genes:
+        return
+    zoom = scaled_size / cell.size
+    center_x = scaled_x + scaled_size // 2
+    center_y = scaled_y + scaled_size // 2
+
+    # Draw selector
+    gene_radius = 6 * zoom
+    gene_size = min(6 * zoom, 24 * zoom / len(genes))
+    angle = math.pi / 2 + (2 * math.pi * tick) / len(genes)
+
+    # Calculate start point (from circle)
+    start_x = center_x + (scaled_size // 6) * math.cos(angle)
+    start_y = center_y + (scaled_size // 6) * math.sin(angle)
+
+    # Calculate end point (just past the gene)
+    end_x = center_x + (gene_radius + gene_size/2) * math.cos(angle)
+    end_y = center_y + (gene_radius + gene_size/2) * math.sin(angle)
+
+    # Calculate trapezoid points with consistent width
+    width = gene_size * 0.3
+    perp_x = math.cos(angle + math.pi/2)
+    perp_y = math.sin(angle + math.pi/2)
+
+    points = [
+        (start_x - width * perp_x, start_y - width * perp_y),
+        (start_x + width * perp_x, start_y + width * perp_y),
+        (end_x + width * 1.5 * perp_x, end_y + width * 1.5 * perp_y),
+        (end_x - width * 1.5 * perp_x, end_y - width * 1.5 * perp_y)
+    ]
+
+    pygame.draw.polygon(screen, (255, 255, 255), points)
+
+    # Highlight flashes at the start of each tick and fades out over the
+    # rest of it, by len(genes) a sixtieth of a tick. Worked out from the
+    # tick alone, drawing never changes the cell.
+    brightness = max(0, 128 - int(len(genes) * 60 * max(0, tick - math.floor(tick) - 0.1)))
+
+    if brightness:
+        i = math.floor(tick) % len(genes)
+        gene = genes[i]
+        primary, secondary = _gene_polygons(center_x, center_y, len(genes), i, zoom)
+        color = tuple(max(0, min(255, int(c + brightness))) for c in geneColors[gene.action])
+        pygame.draw.polygon(screen, _dimmed(color, _shownHealth(cell.geneHealth[i])), primary)
+        color = tuple(min(255, c + brightness) for c in geneColors[gene.target])
+        pygame.draw.polygon(screen, color, secondary)
+
+def drawCells(screen, cells, tick, offset_x, offset_y, zoom, detailed=True):
+    # Blit every visible cell and wall sprite in one go, then draw the
+    # overlays on top. Without detail cells are plain body-coloured tiles.
+    screen_width, screen_height = screen.get_width(), screen.get_height()
+    sprites = []
+    overlays = []
+    for cell in cells:
+        scaled_x = round((cell.x + offset_x) * zoom)
+        scaled_y = round((cell.y + offset_y) * zoom)
+        scaled_size = round(cell.size * zoom)
+        if scaled_size < 1 or not is_visible_on_screen(scaled_x, scaled_y, scaled_size, scaled_size, screen_width, screen_height):
+            continue
+
+        if isinstance(cell, Cell) and not detailed:
+            sprites.append((_atlas.tileSprite(scaled_size, (210, 180, 140)), (scaled_x - 1, scaled_y - 1)))
+        elif isinstance(cell, Cell):
+            sprites.append((_atlas.cellSprite(cell, scaled_size), (scaled_x - 1, scaled_y - 1)))
+            overlays.append((cell, scaled_x, scaled_y, scaled_size))
+        elif isinstance(cell, Wall):
+            sprites.append((_atlas.wallSprite(scaled_size), (scaled_x - 1, scaled_y - 1)))
+
+    screen.blits(sprites, doreturn=False)
+    for cell, scaled_x, scaled_y, scaled_size in overlays:
+        drawCellOverlay(screen, cell, tick, scaled_x, scaled_y, scaled_size)
+
+def drawParticle(screen, x, y, radius, food, offset_x, offset_y, zoom):
+    # Food or waste at x, y (see particlePositions), straight from the store
+    # columns so it works on a World and a WorldSnapshot alike
+    scaled_x = (x + offset_x) * zoom
+    scaled_y = (y + offset_y) * zoom
+    scaled_radius = radius * zoom
+
+    if not is_visible_on_screen(scaled_x - scaled_radius, scaled_y - scaled_radius,
+                                scaled_radius * 2, scaled_radius * 2,
+                                screen.get_width(), screen.get_height()):
+        return
+
+    color = (255,0,0) if food else (150,75,0)
+    pygame.draw.circle(screen, color, (int(scaled_x), int(scaled_y)), int(scaled_radius))
+
+def drawUGM(screen, ugm, offset_x=0, offset_y=0, zoom=1, x=None, y=None):
+    # Calculate position
+    pos = (int(((ugm.x if x is None else x) + offset_x) * zoom), int(((ugm.y if y is None else y) + offset_y) * zoom))
+    radius = int(ugm.radius * zoom)
+
+    # Check if visible on screen
+    if not is_visible_on_screen(pos[0] - radius, pos[1] - radius, radius * 2, radius * 2, screen.get_width(), screen.get_height()):
+        return
+
+    # Draw the genetic material circle
+    pygame.draw.circle(screen, ugm.color, pos, radius)
+
+    # Draw the genes as small colored dots around the circle
+    if ugm.genes:
+        for i, gene in enumerate(ugm.genes):
+            angle = (i / len(ugm.genes)) * 2 * math.pi
+            gene_x = pos[0] + math.cos(angle) * (ugm.radius + 2) * zoom
+            gene_y = pos[1] + math.sin(angle) * (ugm.radius + 2) * zoom
+            gene_color = geneColors[gene.action]
+            pygame.draw.circle(screen, gene_color, (int(gene_x), int(gene_y)), max(1, int(1 * zoom)))
+
+def drawParticleHeatmap(screen, world, offset_x, offset_y, zoom):
+    # Food and waste binned into heatmap_bin sized squares of the screen, so
+    # the work follows the particles in view and the screen size rather than
+    # the world. Each square takes the mix of food and waste colours in it
+    # and gets more opaque the more particles it holds.
+    store = world.store
+    n = store.count
+    width = max(1, math.ceil(screen.get_width() / heatmap_bin))
+    height = max(1, math.ceil(screen.get_height() / heatmap_bin))
+
+    # Bin coordinates; particles in the wrap margin count at the world's edge
+    scale = zoom / heatmap_bin
+    x = (np.clip(store.x[:n], 0, world.width) + offset_x) * scale
+    y = (np.clip(store.y[:n], 0, world.height) + offset_y) * scale
+    types = store.type[:n]
+    shown = np.flatnonzero(store.alive[:n] & (types != UGM) & (x >= 0) & (x < width) & (y >= 0) & (y < height))
+    bins = x[shown].astype(np.int64) * height + y[shown].astype(np.int64)
+    total = np.bincount(bins, minlength=width * height).reshape(width, height)
+    if not total.any():
+        return
+    foodCount = np.bincount(bins[types[shown] == FOOD], minlength=width * height).reshape(width, height)
+    share = np.divide(foodCount, total, out=np.zeros(total.shape), where=total > 0)[..., None]
+
+    heatmap = pygame.Surface((width, height), pygame.SRCALPHA)
+    colors = share * (255, 0, 0) + (1 - share) * (150, 75, 0)
+    pygame.surfarray.blit_array(heatmap, colors.astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype=np.uint32))
+    pygame.surfarray.pixels_alpha(heatmap)[:] = np.minimum(255, total * 96).astype(np.uint8)
+    screen.blit(pygame.transform.scale(heatmap, (width * heatmap_bin, height * heatmap_bin)), (0, 0))
+
+def viewport(screen, offset_x, offset_y, zoom):
+    # The world rectangle (left, top, right, bottom) the screen shows
+    left, top = -offset_x, -offset_y
+    return left, top, left + screen.get_width() / zoom, top + screen.get_height() / zoom
+
+def visibleRows(store, view, margin):
+    # Live particle rows within margin world pixels of the viewport
+    left, top, right, bottom = view
+    n = store.count
+    x, y = store.x[:n], store.y[:n]
+    return np.flatnonzero(store.alive[:n] & (x >= left - margin) & (x <= right + margin) & (y >= top - margin) & (y <= bottom + margin))
+
+def particlePositions(store, alpha):
+    # Every particle's position alpha of the way from the start of the last
+    # step to now. Ones that wrapped around the world edge during the step
+    # are just drawn where they are.
+    n = store.count
+    x, y = store.x[:n], store.y[:n]
+    if alpha >= 1:
+        return x, y
+    dx, dy = x - store.px[:n], y - store.py[:n]
+    wrapped = (np.abs(dx) > cell_size) | (np.abs(dy) > cell_size)
+    return np.where(wrapped, x, x - dx * (1 - alpha)), np.where(wrapped, y, y - dy * (1 - alpha))
+
+def drawWorld(screen, world, lasers, offset_x, offset_y, zoom, profiler=None, alpha=1.0):
+    # Only cells in grid buckets overlapping the viewport and particles
+    # inside it get as far as a draw call. A profiler gets the world and the
+    # lasers as separate phases. alpha is how far the frame is between the
+    # last step and the next one, particles are drawn that far along. world
+    # can also be a WorldSnapshot.
+    detailed = zoom >= lod_zoom
+    view = viewport(screen, offset_x, offset_y, zoom)
+    left, top, right, bottom = view
+    cells = world.grid.query(left - cell_size, top - cell_size, right, bottom)
+    drawCells(screen, cells, world.tick, offset_x, offset_y, zoom, detailed)
+
+    store = world.store
+    x, y = particlePositions(store, alpha)
+    if detailed:
+        rows = visibleRows(store, view, 10)  # Room for a UGM's radius and gene dots
+        for row, particle_x, particle_y, radius, kind in zip(rows.tolist(), x[rows].tolist(), y[rows].tolist(),
+                                                             store.radius[rows].tolist(), store.type[rows].tolist()):
+            if kind == UGM:
+                drawUGM(screen, store.proxies[row], offset_x, offset_y, zoom, particle_x, particle_y)
+            else:
+                drawParticle(screen, particle_x, particle_y, radius, kind == FOOD, offset_x, offset_y, zoom)
+    else:
+        drawParticleHeatmap(screen, world, offset_x, offset_y, zoom)
+        rows = visibleRows(store, view, 10)
+        rows = rows[store.type[rows] == UGM]
+        for row, particle_x, particle_y in zip(rows.tolist(), x[rows].tolist(), y[rows].tolist()):
+            drawUGM(screen, store.proxies[row], offset_x, offset_y, zoom, particle_x, particle_y)
+
+    if profiler:
+        profiler.mark("draw")
+
+    # Turn the lasers fired during the last step into visible effects
+    for event in world.laserEvents:
+        lasers.fire(*event, 5, 2)
+    world.laserEvents = []
+
+    lasers.draw(screen, offset_x, offset_y, zoom, view)
+    if profiler:
+        profiler.mark("lasers")
+
+phaseColors = [(120, 120, 120), (255, 200, 0), (0, 170, 0), (0, 120, 255), (150, 75, 0), (255, 140, 200),
+               (0, 200, 200), (255, 0, 0), (160, 0, 220), (60, 60, 60), (255, 255, 255)]
+
+def drawProfiler(screen, profiler, x, y, frames=150, height=120, budget=1000/30):
+    # Stacked bar per frame, one colour per phase, oldest on the left. The
+    # full height is `budget` ms and the line marks a 60 FPS frame.
+    durations = profiler.recent(frames)
+    if not len(durations):
+        return
+    top = np.cumsum(durations, axis=1) * (height / budget)
+    # Phase each pixel row of each bar falls in, len(phases) above the stack
+    rows = height - 1 - np.arange(height)
+    phase = (rows[None, :, None] >= top[:, None, :]).sum(axis=2)
+    colors = np.array(phaseColors[:len(profiler.phases)] + [(20, 20, 20)], dtype=np.uint8)
+    chart = pygame.surfarray.make_surface(np.repeat(colors[phase], 2, axis=0))
+    chart.set_alpha(220)
+    screen.blit(chart, (x, y))
+    line_y = y + height - round(height * (1000 / 60) / budget)
+    pygame.draw.line(screen, (255, 255, 255), (x, line_y), (x + chart.get_width(), line_y))
+
+    # Legend with each phase's average over the frames shown
+    average = durations.mean(axis=0)
+    for i, name in enumerate(profiler.phases):
+        legend_y = y + i * 11
+        pygame.draw.rect(screen, phaseColors[i], (x + frames * 2 + 6, legend_y + 2, 7, 7))
+        write_text(screen, f"{name} {average[i]:.2f}", x + frames * 2 + 16, legend_y, (0, 0, 0), 14, left=True)
@@ -0,0 +1,129 @@
+import gzip
+import json
+
+from cellWorld import World, compileGenome
+
+# Record and replay of a run. A recording is the header World was built from
+# plus every input that reached it afterwards, in order:
+#   ["steps", dt, count]                    count consecutive step(dt) calls
+#   ["edit", cellHandle, [gene, ...]]       World.editGenes
+#   ["ugm", x, y, velx, vely, [gene, ...]]  World.placeUGM
+#   ["view", offset_x, offset_y, zoom]      camera, only used when watching
+# Since the world owns all its randomness and its clock, replaying these
+# entries against a fresh World reproduces the run exactly. Files are gzipped
+# JSON lines, header first.
+
+class Recording:
+    def __init__(self, header, entries=None):
+        self.header = header
+        self.entries = entries if entries is not None else []
+        self._view = None
+
+    @classmethod
+    def fromWorld(cls, world):
+        # Start recording a freshly built world (before its first step)
+        recording = cls({
+            "version": 1,
+            "spongeSize": world.spongeSize,
+            "particleCount": world.particleCount,
+            "seed": world.seed,
+            "genes": [gene.text for gene in world.genes],
+            "foodShare": world.foodShare,
+            "friction": world.friction,
+            "damping": world.damping,
+        })
+        world.recorder = recording
+        return recording
+
+    def newWorld(self):
+        header = self.header
+        return World(header["spongeSize"], header["particleCount"], header["seed"],
+                     genes=compileGenome(header["genes"]), foodShare=header["foodShare"],
+                     friction=header["friction"], damping=header["damping"])
+
+    def record(self, kind, *args):
+        if kind == "step":
+            last = self.entries[-1] if self.entries else None
+            if last and last[0] == "steps" and last[1] == args[0]:
+                last[2] += 1
+            else:
+                self.entries.append(["steps", args[0], 1])
+        else:
+            self.entries.append([kind, *args])
+
+    def view(self, offset_x, offset_y, zoom):
+        if (offset_x, offset_y, zoom) != self._view:
+            self._view = (offset_x, offset_y, zoom)
+            self.record("view", offset_x, offset_y, zoom)
+
+    @property
+    def steps(self):
+        return sum(entry[2] for entry in self.entries if entry[0] == "steps")
+
+    def save(self, path):
+        with gzip.open(path, "wt") as log:
+            log.write(json.dumps(self.header) + "\n")
+            for entry in self.entries:
+                log.write(json.dumps(entry) + "\n")
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt") as log:
+            header = json.loads(log.readline())
+            if header.get("version") != 1:
+                raise ValueError(f"Unsupported recording version in {path}")
+            return cls(header, [json.loads(line) for line in log])
+
+class Replayer:
+    # Plays a Recording back into a new world one step at a time
+    def __init__(self, recording):
+        self.recording = recording
+        self.world = recording.newWorld()
+        self.view = None  # Last camera entry seen, if any
+        self.steps = 0
+        self._entry = 0
+        self._repeat = 0  # Steps already taken from the current "steps" entry
+
+    @property
+    def done(self):
+        return self._entry >= len(self.recording.entries)
+
+    @property
+    def nextDt(self):
+        # dt of the next step to be played, None at the end
+        entries = self.recording.entries
+        for i in range(self._entry, len(entries)):
+            if entries[i][0] == "steps":
+                return entries[i][1]
+        return None
+
+    def stepOnce(self):
+        # Apply entries up to and including the next step. False at the end.
+        entries = self.recording.entries
+        while self._entry < len(entries):
+            entry = entries[self._entry]
+            kind = entry[0]
+            if kind == "steps":
+                self.world.step(entry[1])
+                self.steps += 1
+                self._repeat += 1
+                if self._repeat == entry[2]:
+                    self._entry += 1
+                    self._repeat = 0
+                return True
+
+            if kind == "edit":
+                cell = self.world.cellByHandle(entry[1])
+                if cell is not None:
+                    self.world.editGenes(cell, compileGenome(entry[2]))
+            elif kind == "ugm":
+                self.world.placeUGM(*entry[1:5], compileGenome(entry[5]))
+            elif kind == "view":
+                self.view = tuple(entry[1:])
+            self._entry += 1
+        return False
+
+    def skipTo(self, step):
+        # Run headless up to the given step (or the end of the recording)
+        while self.steps < step and self.stepOnce():
+            pass
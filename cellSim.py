@@ -1,709 +1,71 @@
 import pygame
 import math
 import sys
-import random
+import time
+import argparse
+from collections import deque
+
+from cellWorld import World, Cell, compileGene, compileGenome, gene_codes, runHeadless, printStats
+from cellReplay import Recording, Replayer
+from cellCheckpoint import Autosave, saveCheckpoint, loadCheckpoint
+from cellProfile import Profiler, exportTrace
+from cellThread import SimulationThread
+import cellRender
+from cellRender import geneColors, is_visible_on_screen, write_text, textCache, LaserPool, drawWorld, drawProfiler
 
-ternary = lambda a, b, c: b if a else c
-tick = 0
-cell_size = 20
-half_size = cell_size / 2
-damping = 0.9  # Reduces jitter post-collision
-friction = 0.99  # General velocity damping
 cellEditMode = False
 ugmMode = False
-
-def generateMergerSponge(size):
-    def nearest_power_of_3(n):
-        power = 1
-        while power < n:
-           power *= 3
-        return power
-
-    size = nearest_power_of_3(size)
-
-    if size == 1:
-        return [[True]]
-
-    smaller = generateMergerSponge(size // 3)
-    smaller_size = len(smaller)
-  
-    result = []
-    for i in range(3 * smaller_size):
-        result.append([False] * (3 * smaller_size))
-  
-    for i in range(smaller_size):
-        for j in range(smaller_size):
-            if smaller[i][j]:
-                result[i][j] = True
-                result[i][j + smaller_size] = True
-                result[i][j + 2 * smaller_size] = True
-                result[i + smaller_size][j] = True
-                result[i + 2 * smaller_size][j] = True
-                result[i + 2 * smaller_size][j + smaller_size] = True
-                result[i + 2 * smaller_size][j + 2 * smaller_size] = True
-                result[i + smaller_size][j + 2 * smaller_size] = True
-
-    return result
-
-pygame.init()
-clock = pygame.time.Clock()
-geneColors = [(40, 40, 40), (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255), (180, 100, 220), (83, 195, 182)]
-screen = pygame.display.set_mode((800, 600))
-pygame.display.set_caption("Cell Simulation - Natch")
-
-def is_visible_on_screen(x, y, width, height, screen_width, screen_height):
-    return not (x > screen_width or x + width < 0 or y > screen_height or y + height < 0)
-
-class Laser:
-    def __init__(self, x, y, targetX, targetY, thickess, amplitude):
-        self.x = x
-        self.y = y
-        self.tx = targetX
-        self.ty = targetY
-        self.thickness = thickess
-        self.amplitude = amplitude
-        self.ot = self.thickness
-    
-    def draw(self, screen, offset_x, offset_y, zoom):
-            self.thickness = max(0.1, self.thickness - 0.2)
-            if self.thickness == 0.1:
-                return
-            
-            dx = self.tx - self.x
-            dy = self.ty - self.y
-            distance = math.sqrt(dx * dx + dy * dy)
-            
-            if distance == 0:
-                lasers.remove(self)
-            
-            num_points = 50
-            points = []
-            
-            for i in range(num_points):
-                progress = i / (num_points - 1)
-                x = self.x + dx * progress
-                y = self.y + dy * progress
-                edge_damping = math.sin(progress * math.pi)  # Creates a smooth curve that peaks in middle
-                wave_offset = math.sin(progress * 6 * math.pi + (self.thickness * 2)) * self.amplitude * edge_damping
-                perpendicular_x = -dy / distance
-                perpendicular_y = dx / distance
-                x += perpendicular_x * wave_offset
-                y += perpendicular_y * wave_offset
-                
-                screen_x = (x + offset_x) * zoom
-                screen_y = (y + offset_y) * zoom
-                points.append((screen_x, screen_y))
-                
-            if len(points) >= 2:
-                pygame.draw.lines(screen, (255, 0, 0), False, points, max(1, int(self.thickness * zoom)))
-
-class Cell:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.size = 20
-        self.membraneHealth = 120
-        self.genes = ['6;8', '3;3', '3;3', '1;1', '6;7', '2;2', '4;6a', '5;6a']
-        self.geneHealth = [100, 100, 100, 100, 100, 100, 100, 100]
-        self._cache = {}  # Cache for polygon points
-        self.memory = ""
-        self.doIn = True
-        self.onGeneNumber = 0
-        self.geneBrightness = 0
-        self.energy = 100
-        self.myTick = 0
-
-    def _calculate_gene_points(self, pos_x, pos_y, gene_size, angle):
-        cache_key = (pos_x, pos_y, gene_size, angle)
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-    
-        half_size = gene_size / 4
-        points = [
-                 (pos_x - half_size * math.cos(angle) + half_size * math.sin(angle),
-                  pos_y - half_size * math.sin(angle) - half_size * math.cos(angle)),
-                 (pos_x + half_size * math.cos(angle) + half_size * math.sin(angle),
-                  pos_y + half_size * math.sin(angle) - half_size * math.cos(angle)),
-                 (pos_x + half_size * math.cos(angle) - half_size * math.sin(angle),
-                  pos_y + half_size * math.sin(angle) + half_size * math.cos(angle)),
-                 (pos_x - half_size * math.cos(angle) - half_size * math.sin(angle),
-                  pos_y - half_size * math.sin(angle) + half_size * math.cos(angle))
-        ]
-        self._cache[cache_key] = points
-        return points
-
-    def draw(self, screen, offset_x, offset_y, zoom):
-        scaled_x = round((self.x + offset_x) * zoom)
-        scaled_y = round((self.y + offset_y) * zoom)
-        scaled_size = round(self.size * zoom)
-        
-        if not is_visible_on_screen(scaled_x, scaled_y, scaled_size, scaled_size, screen.get_width(), screen.get_height()):
-            return
-
-        center_x = scaled_x + scaled_size // 2
-        center_y = scaled_y + scaled_size // 2
-
-        # Draw cell body
-        pygame.draw.rect(screen, (210, 180, 140), (scaled_x-1, scaled_y-1, scaled_size+2, scaled_size+2))
-        
-        # Draw cell membrane
-        membrane_width = round(self.membraneHealth / 60 * zoom)
-        membrane_rect = pygame.Rect(scaled_x - 1, scaled_y - 1,
-                                    scaled_size + 2, scaled_size + 2)
-        pygame.draw.rect(screen, (245, 222, 179), membrane_rect, int(membrane_width))
-        
-        # Draw inside/outside indicator (doIn)
-        if self.doIn:
-            pygame.draw.polygon(screen, (127,127,127), ((center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.45 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.45 + scaled_size//1.7)))
-        else:
-            pygame.draw.polygon(screen, (220,220,220), ((center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.45 + scaled_size//1.7, center_y - scaled_size*0.2 + scaled_size//1.7), (center_x - scaled_size*0.2 + scaled_size//1.7, center_y - scaled_size*0.45 + scaled_size//1.7)))
-        
-        pygame.draw.circle(screen, (255, 255, 255), (center_x, center_y), scaled_size // 6, math.floor(scaled_size // 30))
-        
-        # Draw selector
-        if len(self.genes) > 0:
-            gene_radius = 6 * zoom
-            gene_size = min(6 * zoom, 24 * zoom / len(self.genes))
-            angle = math.pi / 2 + (2 * math.pi * tick) / len(self.genes)
-
-            # Calculate start point (from circle)
-            start_x = center_x + (scaled_size // 6) * math.cos(angle)
-            start_y = center_y + (scaled_size // 6) * math.sin(angle)
-
-            # Calculate end point (just past the gene)
-            end_x = center_x + (gene_radius + gene_size/2) * math.cos(angle)
-            end_y = center_y + (gene_radius + gene_size/2) * math.sin(angle)
-
-            # Calculate trapezoid points with consistent width
-            width = gene_size * 0.3
-            perp_x = math.cos(angle + math.pi/2)
-            perp_y = math.sin(angle + math.pi/2)
-            
-            points = [
-                (start_x - width * perp_x, start_y - width * perp_y),
-                (start_x + width * perp_x, start_y + width * perp_y),
-                (end_x + width * 1.5 * perp_x, end_y + width * 1.5 * perp_y),
-                (end_x - width * 1.5 * perp_x, end_y - width * 1.5 * perp_y)
-            ]
-            
-            pygame.draw.polygon(screen, (255, 255, 255), points)
-
-        gene_radius = 6 * zoom
-        gene_size = min(6 * zoom, 24 * zoom / len(self.genes))
-        base_angle = math.pi / 2  # Start from top
-
-        for i, gene in enumerate(self.genes):
-            try:
-                gene_x, gene_y = map(int, gene.split(';'))
-            except:
-                gene_x = int(gene.split(';')[0])
-                gene_y = int(''.join(filter(str.isdigit, gene.split(';')[1])))
-            angle = base_angle + (2 * math.pi * i) / len(self.genes)
-
-            pos_x = center_x + gene_radius * math.cos(angle)
-            pos_y = center_y + gene_radius * math.sin(angle)
-            
-            if tick - math.floor(tick) <= 0.1:
-                self.geneBrightness = 128
-            else:
-                self.geneBrightness -= 1
-                if self.geneBrightness < 0:
-                    self.geneBrightness = 0
-
-            # Primary gene
-            points = self._calculate_gene_points(pos_x, pos_y, gene_size, angle)
-            color = geneColors[gene_x]
-            if math.floor(tick) % len(self.genes) == i:
-                color = tuple(max(0, min(255, int(c + self.geneBrightness))) for c in color)
-            color = tuple(max(0, min(255, c - int(255 - self.geneHealth[self.genes.index(gene)]*2.55))) for c in color)
-            pygame.draw.polygon(screen, color, points)
-
-            # Secondary gene
-            offset_x = gene_size * math.cos(angle + math.pi) / 2
-            offset_y = gene_size * math.sin(angle + math.pi) / 2
-            points = self._calculate_gene_points(pos_x + offset_x, pos_y + offset_y, gene_size, angle)
-            color = geneColors[gene_y]
-            if math.floor(tick) % len(self.genes) == i:
-                color = tuple(min(255, c + self.geneBrightness) for c in color)
-            pygame.draw.polygon(screen, color, points)
-
-    def update(self):
-        if self.membraneHealth < 1:
-            newParticles = [Particle(self.x, self.y, 'waste', 2) for _ in range(10)]
-            particles.extend(newParticles)
-            for i, cell in enumerate(cells):
-                if cell == self:
-                    cells.pop(i)
-                    break
-        
-        if self.myTick != math.floor(tick):
-            self.myTick = math.floor(tick)
-            self.executeGene(math.floor(tick) % len(self.genes))
-    
-    def executeGene(self, index):
-        try:
-            gene = self.genes[index]
-        except:
-            return
-        
-        self.energy -= 3
-        self.geneHealth[index] -= random.randint(1, 4)
-        
-        geneA, geneB = gene.split(';')
-        geneA = int(geneA)
-        try:
-            geneB = int(geneB)
-        except:
-            pass
-        
-        if geneA == 1:
-            if geneB == 1 and not self.doIn:
-                foodParts = self.getInternalParticles('food')
-                if foodParts:
-                    for food in foodParts:
-                        self.drawLaser(food.x, food.y)
-                        particles.remove(food)
-                        self.energy += 10
-                        particles.append(Particle(self.x, self.y, 'waste', 2))
-            elif geneB == 3 and not self.doIn:
-                self.membraneHealth = 0
-                self.drawLaser(self.x - 20, self.y - 20)
-                self.drawLaser(self.x + 20, self.y - 20)
-                self.drawLaser(self.x - 20, self.y + 20)
-                self.drawLaser(self.x + 20, self.y + 20)
-        elif geneA == 2:
-            if geneB == 3 and not self.doIn:
-                self.membraneHealth = 0
-                self.drawLaser(self.x - 20, self.y - 20)
-                self.drawLaser(self.x + 20, self.y - 20)
-                self.drawLaser(self.x - 20, self.y + 20)
-                self.drawLaser(self.x + 20, self.y + 20)
-            elif geneB == 2 and self.doIn:
-                wasteParts = self.getInternalParticles('waste')
-                if wasteParts:
-                    # Weight particles by inverse distance - closer particles more likely
-                    weights = []
-                    for waste in wasteParts:
-                        distance = math.sqrt((waste.x - self.x)**2 + (waste.y - self.y)**2)
-                        weights.append(1.0 / (distance + 1))  # Add 1 to avoid division by zero
-                    waste = random.choices(wasteParts, weights=weights, k=1)[0]
-                    self.drawLaser(waste.x, waste.y)
-                    particles.remove(waste)
-            elif geneB == 1 and self.doIn:
-                foodParts = self.getInternalParticles('food')
-                if foodParts:
-                    food = random.choice(foodParts)
-                    self.drawLaser(food.x, food.y)
-                    particles.remove(food)
-                    particles.append(Particle(self.x, self.y, 'waste', 2))
-        elif geneA == 3:
-            if geneB == 3 and not self.doIn:
-                self.membraneHealth += 25
-                if self.membraneHealth > 120:
-                    self.membraneHealth = 120
-        elif geneA in [4, 5, 7]:
-            self.processADNA(geneA, geneB)
-            pass
-        elif geneA == 6:
-            if geneB == 7:
-                self.doIn = True
-            elif geneB == 8:
-                self.doIn = False
-    
-    def processADNA(self, geneA, geneB):
-        # format:
-        # 4/5(firstGene.lastGenne)
-        # 6a/b
-        
-        target_genes = []
-        
-        # ADNA nono's:
-        if geneA in [3,6]:
-            print("Invalid geneA:", geneA)
-            return
-        
-        # Select target genes
-        if geneB[0] in ['4', '5']:
-            startGene = geneB.split(".")[0][2:]
-            endGene = geneB.split(".")[1][:-1]
-            
-            if startGene in self.genes and endGene in self.genes:
-                target_genes = self.genes[self.genes.index(startGene):self.genes.index(endGene)]
-        
-        elif geneB[0] == '6':
-            if geneB[1] == 'a':
-                target_genes = [min(self.genes, key=lambda gene: self.geneHealth[self.genes.index(gene)])]
-            elif geneB[1] == 'b':
-                target_genes = [max(self.genes, key=lambda gene: self.geneHealth[self.genes.index(gene)])]
-        
-        # Apply effects to target genes
-        for gene in target_genes:
-            if geneA in [1, 2]:
-                if geneA == 1:
-                    self.energy += 3
-                self.genes.remove(gene)
-                particles.append(Particle(self.x, self.y, 'waste', 2))
-            elif geneA == 4:
-                self.memory = gene
-            elif geneA == 5:
-                self.genes[self.genes.index(gene)] = self.memory
-        
-    def drawLaser(self, x, y):
-        lasers.append(Laser(self.x, self.y, x, y, 5, 2))
-
-    def getInternalParticles(self, typeFilter=None):
-        # Check particles in a 20 radius area around the cell center
-        nearby_particles = []
-        for particle in particles:
-            distance = math.sqrt((particle.x - (self.x + self.size/2))**2 + (particle.y - (self.y + self.size/2))**2)
-            if distance <= 10:
-                if typeFilter is None or particle.type == typeFilter:
-                    nearby_particles.append(particle)
-        
-        # Draw detection range circle
-        pygame.draw.circle(screen, (100,100,100), (int((self.x + self.size/2 + offset_x) * zoom), int((self.y + self.size/2 + offset_y) * zoom)), int(10 * zoom), 1)
-        
-        if not typeFilter:
-            return nearby_particles
-        
-        return [particle for particle in nearby_particles if particle.type == typeFilter]
-
-class Wall:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.size = 20
-        self.membraneHealth = 0
-    
-    def draw(self, screen, offset_x, offset_y, zoom):
-        scaled_x = round((self.x + offset_x) * zoom)
-        scaled_y = round((self.y + offset_y) * zoom)
-        scaled_size = round(self.size * zoom)
-        
-        if not is_visible_on_screen(scaled_x, scaled_y, scaled_size, scaled_size, screen.get_width(), screen.get_height()):
-            return
-        
-        pygame.draw.rect(screen, (0, 0, 0), (scaled_x-1, scaled_y-1, scaled_size+2, scaled_size+2))
-    
-    def update(self):
-        pass
-
-class Particle:
-    def __init__(self, x, y, type, radius):
-        self.x = x
-        self.y = y
-        self.type = type
-        self.radius = radius
-        self.speed = 2  # Reduced speed for more controlled movement
-        self.velx = random.random() * 2 - 1
-        self.vely = random.random() * 2 - 1
-        
-        # Normalize initial velocity
-        magnitude = math.sqrt(self.velx**2 + self.vely**2)
-        self.velx /= magnitude
-        self.vely /= magnitude
-    
-    def draw(self, screen, offset_x, offset_y, zoom):
-        scaled_x = (self.x + offset_x) * zoom
-        scaled_y = (self.y + offset_y) * zoom
-        scaled_radius = self.radius * zoom
-
-        if not is_visible_on_screen(scaled_x - scaled_radius, scaled_y - scaled_radius,
-                                    scaled_radius * 2, scaled_radius * 2,
-                                    screen.get_width(), screen.get_height()):
-            return
-
-        color = (255,0,0) if self.type == "food" else (150,75,0)
-        pygame.draw.circle(screen, color, (int(scaled_x), int(scaled_y)), int(scaled_radius))
-    
-    def check_wall_collision(self, walls):
-        cell_size = 20  # Size of grid cells
-        grid_x = int(self.x // cell_size)
-        grid_y = int(self.y // cell_size)
-        
-        
-        # Only check walls in neighboring grid cells
-        for wall in walls:
-            if type(wall) == Cell and self.type == "food":
-                # Calculate if particle is inside the cell
-                is_inside = (self.x > wall.x and self.x < wall.x + wall.size and 
-                             self.y > wall.y and self.y < wall.y + wall.size)
-                
-                # Only damage cell if particle is actually touching the membrane
-                if is_inside:
-                    if not hasattr(self, 'last_damaged_cell') or self.last_damaged_cell != wall:
-                        wall.membraneHealth -= 1
-                        self.last_damaged_cell = wall
-                else:
-                    continue
-            
-            wall_grid_x = int(wall.x // cell_size)
-            wall_grid_y = int(wall.y // cell_size)
-            
-            # Skip walls that are too far away
-            if abs(grid_x - wall_grid_x) > 1 or abs(grid_y - wall_grid_y) > 1:
-                continue
-            
-            # Calculate points for the wall's membrane (1 pixel thick border)
-            membrane_points = [
-                (wall.x, wall.y),                          # Top left
-                (wall.x + wall.size, wall.y),             # Top right
-                (wall.x + wall.size, wall.y + wall.size), # Bottom right
-                (wall.x, wall.y + wall.size)              # Bottom left
-            ]
-            
-            # Check collision with each membrane edge
-            for i in range(len(membrane_points)):
-                p1 = membrane_points[i]
-                p2 = membrane_points[(i + 1) % len(membrane_points)]
-                
-                # Calculate closest point on the line segment (membrane edge)
-                edge_length = math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-                if edge_length == 0:
-                    continue
-                
-                # Vector from p1 to particle
-                v1_x = self.x - p1[0]
-                v1_y = self.y - p1[1]
-                
-                # Vector from p1 to p2
-                v2_x = p2[0] - p1[0]
-                v2_y = p2[1] - p1[1]
-                
-                # Calculate projection
-                t = max(0, min(1, (v1_x * v2_x + v1_y * v2_y) / edge_length**2))
-                
-                # Find closest point on line segment
-                closest_x = p1[0] + t * v2_x
-                closest_y = p1[1] + t * v2_y
-                
-                # Calculate distance between closest point and particle center
-                distance_x = self.x - closest_x
-                distance_y = self.y - closest_y
-                distance = math.sqrt(distance_x**2 + distance_y**2)
-                
-                # If collision detected with membrane
-                if distance < self.radius + 1:  # 1 pixel for membrane thickness
-                    # Calculate normal vector
-                    if distance > 0:
-                        normal_x = distance_x / distance
-                        normal_y = distance_y / distance
-                    else:
-                        normal_x = 1
-                        normal_y = 0
-                    
-                    # Calculate relative velocity
-                    dot_product = (self.velx * normal_x + self.vely * normal_y)
-                    
-                    # Apply impulse
-                    impulse = 2.0  # Bounce factor
-                    self.velx -= impulse * dot_product * normal_x
-                    self.vely -= impulse * dot_product * normal_y
-                    
-                    # Move particle out of membrane
-                    penetration = (self.radius + 1) - distance
-                    self.x += normal_x * penetration
-                    self.y += normal_y * penetration
-                    
-                    # Damage wall
-                    wall.membraneHealth -= 1
-                    break
-
-    def update(self, width, height):
-        self.check_wall_collision(cells)
-        
-        # Apply friction
-        self.velx *= friction
-        self.vely *= friction
-
-        # Calculate next position
-        next_x = self.x + self.velx * self.speed
-        next_y = self.y + self.vely * self.speed
-
-        # Update position
-        self.x = next_x
-        self.y = next_y
-        
-        # Wrap around screen edges with smoother transition
-        if self.x < -self.radius:
-            self.x = width + self.radius
-        elif self.x > width + self.radius:
-            self.x = -self.radius
-        if self.y < -self.radius:
-            self.y = height + self.radius
-        elif self.y > height + self.radius:
-            self.y = -self.radius
-
-        self.velx += random.uniform(-0.02, 0.02)
-        self.vely += random.uniform(-0.02, 0.02)
-        
-        # Normalize velocity to maintain consistent speed
-        magnitude = math.sqrt(self.velx**2 + self.vely**2)
-        if magnitude > 0:
-            self.velx /= magnitude
-            self.vely /= magnitude
-        
-        # Apply subtle dampening
-        self.velx *= 0.3
-        self.vely *= 0.3
-
-class UnboundGeneticMaterial(Particle):
-    def __init__(self, x, y, velx, vely, genes):
-        super().__init__(x, y, velx, vely)
-        self.genes = genes
-        self.radius = 3
-        self.color = (150, 50, 150)  # Purple color for genetic material
-        self.creation_time = pygame.time.get_ticks()
-        self.half_life = 15000  # 15 seconds in milliseconds
-    
-    def draw(self, screen, offset_x=0, offset_y=0, zoom=1):
-        # Calculate position
-        pos = (int((self.x + offset_x) * zoom), int((self.y + offset_y) * zoom))
-        radius = int(self.radius * zoom)
-
-        # Check if visible on screen
-        if not is_visible_on_screen(pos[0] - radius, pos[1] - radius, radius * 2, radius * 2, screen.get_width(), screen.get_height()):
-            return
-
-        # Draw the genetic material circle
-        pygame.draw.circle(screen, self.color, pos, radius)
-
-        # Draw the genes as small colored dots around the circle
-        if self.genes:
-            for i, gene in enumerate(self.genes):
-                try:
-                    angle = (i / len(self.genes)) * 2 * math.pi
-                    gene_x = pos[0] + math.cos(angle) * (self.radius + 2) * zoom
-                    gene_y = pos[1] + math.sin(angle) * (self.radius + 2) * zoom
-                    gene_color = geneColors[int(str(gene)[0])]
-                    pygame.draw.circle(screen, gene_color, (int(gene_x), int(gene_y)), max(1, int(1 * zoom)))
-                except (IndexError, ValueError):
-                    # Skip invalid genes or missing colors
-                    continue
-    
-    def check_wall_collision(self, walls):
-        cell_size = 20  # Size of grid cells
-        grid_x = int(self.x // cell_size)
-        grid_y = int(self.y // cell_size)
-        
-        # Only check walls in neighboring grid cells
-        for wall in walls:
-            if type(wall) == Cell and self.type == "food":
-                # Calculate if particle is inside the cell
-                is_inside = (self.x > wall.x and self.x < wall.x + wall.size and 
-                             self.y > wall.y and self.y < wall.y + wall.size)
-                
-                # Only damage cell if particle is actually touching the membrane
-                if is_inside:
-                    if not hasattr(self, 'last_damaged_cell') or self.last_damaged_cell != wall:
-                        wall.membraneHealth -= 1
-                        self.last_damaged_cell = wall
-                else:
-                    continue
-            
-            wall_grid_x = int(wall.x // cell_size)
-            wall_grid_y = int(wall.y // cell_size)
-            
-            # Skip walls that are too far away
-            if abs(grid_x - wall_grid_x) > 1 or abs(grid_y - wall_grid_y) > 1:
-                continue
-            
-            # Calculate points for the wall's membrane (1 pixel thick border)
-            membrane_points = [
-                (wall.x, wall.y),                          # Top left
-                (wall.x + wall.size, wall.y),             # Top right
-                (wall.x + wall.size, wall.y + wall.size), # Bottom right
-                (wall.x, wall.y + wall.size)              # Bottom left
-            ]
-            
-            # Check collision with each membrane edge
-            for i in range(len(membrane_points)):
-                p1 = membrane_points[i]
-                p2 = membrane_points[(i + 1) % len(membrane_points)]
-                
-                # Calculate closest point on the line segment (membrane edge)
-                edge_length = math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-                if edge_length == 0:
-                    continue
-                
-                # Vector from p1 to particle
-                v1_x = self.x - p1[0]
-                v1_y = self.y - p1[1]
-                
-                # Vector from p1 to p2
-                v2_x = p2[0] - p1[0]
-                v2_y = p2[1] - p1[1]
-                
-                # Calculate projection
-                t = max(0, min(1, (v1_x * v2_x + v1_y * v2_y) / edge_length**2))
-                
-                # Find closest point on line segment
-                closest_x = p1[0] + t * v2_x
-                closest_y = p1[1] + t * v2_y
-                
-                # Calculate distance between closest point and particle center
-                distance_x = self.x - closest_x
-                distance_y = self.y - closest_y
-                distance = math.sqrt(distance_x**2 + distance_y**2)
-                
-                # If collision detected with membrane
-                if distance < self.radius + 1:  # 1 pixel for membrane thickness
-                    # Calculate normal vector
-                    if distance > 0:
-                        normal_x = distance_x / distance
-                        normal_y = distance_y / distance
-                    else:
-                        normal_x = 1
-                        normal_y = 0
-                    
-                    # Calculate relative velocity
-                    dot_product = (self.velx * normal_x + self.vely * normal_y)
-                    
-                    # Apply impulse
-                    impulse = 2.0  # Bounce factor
-                    self.velx -= impulse * dot_product * normal_x
-                    self.vely -= impulse * dot_product * normal_y
-                    
-                    # Move particle out of membrane
-                    penetration = (self.radius + 1) - distance
-                    self.x += normal_x * penetration
-                    self.y += normal_y * penetration
-                    
-                    # Damage wall
-                    wall.membraneHealth -= 1
-                    
-                    if type(wall) == Cell:
-                        wall.genes = self.genes + wall.genes
-                        wall.geneHealth.extend([100 for _ in range(len(wall.genes))])
-                        return True
-                    break
-    
-    def update(self, width, height): # type: ignore
-        super().update(width, height)
-        
-        # Check for decay based on half-life
-        current_time = pygame.time.get_ticks()
-        time_alive = current_time - self.creation_time
-        
-        # Random chance to decay based on half-life
-        if time_alive > self.half_life:
-            decay_chance = random.random()
-            if decay_chance < 0.1:  # 10% chance per update after half-life
-                # Create waste particle at current position
-                particles.append(Particle(self.x, self.y, "waste", 2))
-                return True  # Signal that this genetic material should be removed
-        
-        # Check for cell collision
-        if self.check_wall_collision(cells):
-            return True  # Signal that this genetic material should be removed
+offset_x = 0
+offset_y = 0
+zoom = 1.0
+world = None  # Stepped by sim on its own thread, don't touch it while sim runs
+sim = None
+snapshot = None  # What the window draws and the editors read, from sim.take()
+screen = None
+clock = None
+profiler = Profiler()  # F3 toggles it and its overlay
+speeds = {pygame.K_1: 1, pygame.K_2: 4, pygame.K_3: 16, pygame.K_4: None}  # Time warp keys, None runs flat out
+display_fps = 144  # Most frames drawn per second
+warp_fps = 30  # Frames drawn per second while warping, the rest of the time goes to stepping
+FPSs = deque(maxlen=100)
+
+def geneBlocks(genes):
+    # Editors show each gene as two blocks: its action and its target
+    # (including any LANDMARK/range argument)
+    blocks = []
+    for gene in genes:
+        blocks.extend(gene.text.split(";", 1))
+    return blocks
+
+def genesFromBlocks(blocks):
+    # Raises ValueError on a malformed gene so the edit can be rejected
+    return compileGenome([blocks[i] + ";" + blocks[i + 1] for i in range(0, len(blocks), 2)])
+
+def stepBlock(value, delta):
+    # Arrow keys move the leading digit of a block, keeping any argument
+    digit = int(value[0]) if value[:1].isdigit() else 0
+    return str(max(0, min(gene_codes - 1, digit + delta))) + value[1:]
+
+def blockLabel(gene, half):
+    # DNA-to-English translation of one block of a compiled gene
+    dnaAText = ["null", "digest", "expell", "repair", "remmbr", "gnrte", "do", "FTT -> 7", "FTT -> 8"]
+    dnaBText = ["null", "food", "waste", "mmbrne", "DNA", "RDNA", "LNDMRK", "intrnly", "extrnly"]
+    if half == 0:
+        return dnaAText[gene.action]
+    if gene.target == 6:
+        return {"a": "WEAKEST", "b": "STRNGST"}.get(gene.arg, "FTT -> ULM")
+    if gene.target in (4, 5) and gene.arg:
+        start, end = (getattr(part, "text", part) for part in gene.arg)
+        return f"{dnaBText[gene.target]}[{start} to {end}]"
+    return dnaBText[gene.target]
 
 class UGMGenerator:
     def __init__(self):
         self.x = 800
         self.t = 1
         self.selected_ugm = None
-        self.genes = ["1;1"]  # Default genes for new UGM
-        self.font = pygame.font.Font(None, 24)
+        self.genes = compileGenome(["1;1"])  # Default genes for new UGM
+        self.font = textCache.font(24)
         self.placing = False
         self.start_pos = None
         self.end_pos = None  # Target position for dragging
@@ -750,7 +112,7 @@ class UGMGenerator:
             # Draw DNA blocks
             block_height = 40
             block_width = 65
-            genes = ";".join(self.genes).split(";")
+            genes = geneBlocks(self.genes)
             
             # Calculate max scroll
             total_rows = math.ceil(len(genes) / 2)
@@ -762,15 +124,13 @@ class UGMGenerator:
             
             for i in range(0, len(genes), 2):
                 row = i // 2
+                gene = self.genes[row]
                 y = 170 + row * (block_height + 10) - self.scroll_y
                 
                 # Only draw if in visible area
                 if 160 <= y <= 580:
                     for j in range(2):
-                        if i + j >= len(genes):
-                            break
-                        
-                        color = geneColors[int(str(genes[i + j])[0])]
+                        color = geneColors[gene.action if j == 0 else gene.target]
                         block_x = self.x + 20 + (j * (block_width + 5))
                         
                         pygame.draw.rect(screen, color, (block_x, y, block_width, block_height))
@@ -780,44 +140,7 @@ class UGMGenerator:
                             pygame.draw.rect(screen, (100, 100, 100), (block_x, y, block_width, block_height), 2)
                         
                         # DNA-to-English translation
-                        display_text = genes[i + j]
-                        dnaAText = ["digest", "expell", "repair", "remmbr", "gnrte", "do"]
-                        dnaBText = ["food", "waste", "mmbrne", "DNA", "RDNA", "LNDMRK", "intrnly", "extrnly", "memory"]
-                        
-                        try:
-                            if j == 0:
-                                display_text = dnaAText[int(display_text) - 1]
-                            elif j == 1:
-                                base_text = dnaBText[int(str(display_text)[0]) - 1]
-                                if "DNA" in base_text or "LNDMRK" in base_text:
-                                    parts = display_text.split(";")
-                                    if len(parts) > 1:
-                                        value = parts[1]
-                                        if "(" in value and ")" in value:
-                                            value = value[value.find("(")+1:value.find(")")]
-                                        if base_text == "DNA":
-                                            display_text = f"DNA[{value}]"
-                                        elif base_text == "RDNA":
-                                            display_text = f"RDNA[{value}]"
-                                        elif "LNDMRK" in base_text:
-                                            display_text = "FTT -> ULM"
-                                    else:
-                                        if "LNDMRK" in base_text:
-                                            if display_text == "6a":
-                                                display_text = "STRNGST"
-                                            elif display_text == "6b":
-                                                display_text = "WEAKEST"
-                                            else:
-                                                display_text = "FTT -> ULM"
-                                        else:
-                                            display_text = base_text
-                                else:
-                                    display_text = base_text
-                        except Exception as e:
-                            print(e)
-                            print(f"Failed to translate gene #{j}: '" + display_text + "'")
-                            display_text = "FTT -> " + display_text
-                            pass
+                        display_text = blockLabel(gene, j)
                         
                         # Draw text with outline
                         write_text(screen, display_text, block_x + block_width // 2, y + block_height // 2, color=(255-color[0], 255-color[1], 255-color[2]))
@@ -837,14 +160,9 @@ class UGMGenerator:
                 gene_x = 20 + math.cos(angle) * 8
                 gene_y = 20 + math.sin(angle) * 8
                 
-                # Get gene colors
-                gene_parts = gene.split(';')
-                primary_gene = int(gene_parts[0])
-                secondary_gene = int(''.join(filter(str.isdigit, gene_parts[1])))
-                
                 # Draw semi-transparent gene markers
-                primary_color = geneColors[primary_gene] + (128,)  # Add alpha channel
-                secondary_color = geneColors[secondary_gene] + (128,)
+                primary_color = geneColors[gene.action] + (128,)  # Add alpha channel
+                secondary_color = geneColors[gene.target] + (128,)
                 
                 pygame.draw.circle(preview_surface, primary_color, (int(gene_x), int(gene_y)), zoom)
                 pygame.draw.circle(preview_surface, secondary_color, (int(gene_x + 2), int(gene_y)), zoom)
@@ -883,15 +201,11 @@ class UGMGenerator:
                 
                 # Check for add/remove DNA buttons
                 if self.x + 130 <= mouse_x <= self.x + 150 and 130 <= mouse_y <= 150:
-                    genes = ";".join(self.genes).split(";")
-                    genes.extend(["1", "1"])
-                    self.genes = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
+                    self.genes = self.genes + [compileGene("1;1")]
                     return
                 elif self.x + 20 <= mouse_x <= self.x + 40 and 130 <= mouse_y <= 150:
-                    genes = ";".join(self.genes).split(";")
-                    if len(genes) > 2:  # Ensure at least one pair remains
-                        genes = genes[:-2]
-                        self.genes = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
+                    if len(self.genes) > 1:  # Ensure at least one pair remains
+                        self.genes = self.genes[:-1]
                     return
 
                 # Check if clicking the "Place UGM" button
@@ -920,23 +234,20 @@ class UGMGenerator:
 
                         if block_rect.collidepoint(mouse_x, adjusted_mouse_y):
                             self.active_block = i * 2 + j
-                            self.block_value = self.genes[row].split(";")[j]  # Fix indexing
+                            self.block_value = geneBlocks(self.genes)[i * 2 + j]
                             return
 
         elif event.type == pygame.KEYDOWN and self.active_block is not None:
+            if event.key == pygame.K_UP:
+                self.block_value = stepBlock(self.block_value, 1)
+            elif event.key == pygame.K_DOWN:
+                self.block_value = stepBlock(self.block_value, -1)
+            
+            # Apply changes immediately, unless they don't make a valid gene
+            genes = geneBlocks(self.genes)
+            genes[self.active_block] = self.block_value
             try:
-                current_value = int(self.block_value)
-
-                if event.key == pygame.K_UP:
-                    self.block_value = str(min(9, current_value + 1))
-                elif event.key == pygame.K_DOWN:
-                    self.block_value = str(max(0, current_value - 1))
-                
-                # Apply changes immediately
-                genes = ";".join(self.genes).split(";")
-                genes[self.active_block] = self.block_value
-                self.genes = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
-
+                self.genes = genesFromBlocks(genes)
             except ValueError:
                 pass
 
@@ -960,15 +271,13 @@ class UGMGenerator:
                     direction_y /= magnitude
 
                 # Finalize UGM placement with normalized velocity
-                ugm = UnboundGeneticMaterial(
+                sim.placeUGM(
                     adjusted_start_x,
                     adjusted_start_y,
                     direction_x * 2,  # Scale velocity if needed
                     direction_y * 2,  # Scale velocity if needed
                     self.genes
                 )
-                
-                particles.append(ugm)
                 self.placing = False
                 self.start_pos = None
                 self.end_pos = None
@@ -995,41 +304,9 @@ class Button:
                 if self.x <= event.pos[0] <= self.x + self.width and self.y <= event.pos[1] <= self.y + self.height:
                     self.action()
 
-def write_text(screen, text, x, y, color=(0, 0, 0), font_size=20, left=False):
-    if not is_visible_on_screen(x - 50, y - 10, 100, 20, screen.get_width(), screen.get_height()):
-        return
-    font = pygame.font.Font(None, font_size)
-    text_surface = font.render(text, True, color)
-    if left:
-        text_rect = text_surface.get_rect(topleft=(x, y))
-    else:
-        text_rect = text_surface.get_rect(center=(x, y))
-    screen.blit(text_surface, text_rect)
-
-cellArrangement = generateMergerSponge(3**3)
-
-cells = []
-for y in range(len(cellArrangement)):
-    for x in range(len(cellArrangement[y])):
-        if not cellArrangement[y][x]:
-            all_adjacent_true = True
-            for dy in [-1, 0, 1]:
-                for dx in [-1, 0, 1]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= ny < len(cellArrangement) and 0 <= nx < len(cellArrangement[0]):
-                        if cellArrangement[ny][nx]:
-                            all_adjacent_true = False
-                            break
-            
-            if all_adjacent_true:
-                cells.append(Wall(x * 20, y * 20))
-            else:
-                cells.append(Cell(x * 20, y * 20))
 
 def FPSGraph():
     FPSs.append(clock.get_fps())
-    if len(FPSs) > 100:
-        FPSs.pop(0)
     pygame.draw.rect(screen, (200, 200, 200), (460, 5, 200, 15))
     
     # Draw FPS graph
@@ -1046,9 +323,10 @@ class cellEditUI:
         self.selected_cell = None
         self.active_block = None
         self.block_value = ""
-        self.font = pygame.font.Font(None, 24)
+        self.font = textCache.font(24)
         self.scroll_y = 0
         self.max_scroll = 0
+        self.error = ""  # Why the last edit was rejected
 
     def draw(self, screen):
         if cellEditMode:
@@ -1079,6 +357,8 @@ class cellEditUI:
             if self.selected_cell:
                 write_text(screen, "Selected Cell:", self.x + 85, 70, color=(200, 200, 200))
                 write_text(screen, f"Pos: ({self.selected_cell.x}, {self.selected_cell.y})", self.x + 85, 100, color=(180, 180, 180))
+                if self.error:
+                    write_text(screen, self.error, self.x + 85, 118, color=(255, 90, 90), font_size=14)
                 write_text(screen, "DNA Blocks:", self.x + 85, 140, color=(200, 200, 200))
 
                 # Add/Remove DNA buttons
@@ -1091,7 +371,7 @@ class cellEditUI:
                 block_height = 40
                 block_width = 65
                 blocks_per_row = 1
-                genes = ";".join(self.selected_cell.genes).split(";")
+                genes = geneBlocks(self.selected_cell.genes)
                 
                 # Calculate max scroll
                 total_rows = math.ceil(len(genes) / 2)
@@ -1113,7 +393,8 @@ class cellEditUI:
                             if i + j >= len(genes):
                                 break
                             
-                            color = geneColors[int(str(genes[i + j])[0])]
+                            gene = self.selected_cell.genes[i // 2]
+                            color = geneColors[gene.action if j == 0 else gene.target]
                             
                             block_x = x + (j * (block_width + 5))
                             pygame.draw.rect(screen, color, (block_x, y, block_width, block_height))
@@ -1125,45 +406,8 @@ class cellEditUI:
                             if i + j == self.active_block and self.block_value:
                                 display_text = self.block_value
                             else:
-                                display_text = genes[i + j]
+                                display_text = blockLabel(gene, j)
                             
-                            dnaAText = ["digest", "expell", "repair", "remmbr", "gnrte", "do"]
-                            dnaBText = ["food", "waste", "mmbrne", "DNA", "RDNA", "LNDMRK", "intrnly", "extrnly", "memory"]
-                            
-                            try:
-                                if j == 0:
-                                    display_text = dnaAText[int(display_text) - 1]
-                                elif j == 1:
-                                    base_text = dnaBText[int(str(display_text)[0]) - 1]
-                                    if "DNA" in base_text or "LNDMRK" in base_text:
-                                        parts = display_text.split(";")
-                                        if len(parts) > 1:
-                                            value = parts[1]
-                                            if "(" in value and ")" in value:
-                                                value = value[value.find("(")+1:value.find(")")]
-                                            if base_text == "DNA":
-                                                display_text = f"DNA[{value}]"
-                                            elif base_text == "RDNA":
-                                                display_text = f"RDNA[{value}]"
-                                            elif "LNDMRK" in base_text:
-                                                display_text = "FTT -> ULM"
-                                        else:
-                                            if "LNDMRK" in base_text:
-                                                if display_text == "6a":
-                                                    display_text = "STRNGST"
-                                                elif display_text == "6b":
-                                                    display_text = "WEAKEST"
-                                                else:
-                                                    display_text = "FTT -> ULM"
-                                            else:
-                                                display_text = base_text
-                                    else:
-                                        display_text = base_text
-                            except Exception as e:
-                                print(e)
-                                print(f"Failed to translate gene #{j}: '" + display_text + "'")
-                                display_text = "FTT -> " + display_text
-                                pass                            
                             write_text(screen, display_text, block_x + block_width//2, y + block_height//2, color=(255-color[0], 255-color[1], 255-color[2]))
 
     def handleEvents(self, event):
@@ -1181,17 +425,13 @@ class cellEditUI:
                 # Check for add/remove DNA buttons
                 if self.selected_cell:
                     if self.x + 130 <= mouse_x <= self.x + 150 and 130 <= mouse_y <= 150:
-                        genes = ";".join(self.selected_cell.genes).split(";")
-                        genes.extend(["1", "1"])
-                        gene_pairs = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
-                        self.selected_cell.genes = gene_pairs
+                        sim.editGene(self.selected_cell, len(self.selected_cell.genes), compileGene("1;1"))
+                        self.error = ""
                         return
                     elif self.x + 20 <= mouse_x <= self.x + 40 and 130 <= mouse_y <= 150:
-                        genes = ";".join(self.selected_cell.genes).split(";")
-                        if len(genes) > 2:  # Ensure at least one pair remains
-                            genes = genes[:-2]
-                            gene_pairs = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
-                            self.selected_cell.genes = gene_pairs
+                        if len(self.selected_cell.genes) > 1:  # Ensure at least one pair remains
+                            sim.editGene(self.selected_cell, len(self.selected_cell.genes) - 1, None)
+                        self.error = ""
                         return
 
                 # Adjust mouse position for offset and zoom
@@ -1199,13 +439,14 @@ class cellEditUI:
                 adjusted_mouse_y = (mouse_y / zoom) - offset_y
 
                 # Check if clicking a cell
-                for cell in cells:
+                for cell in snapshot.cells:
                     if isinstance(cell, Cell):
                         cell_rect = pygame.Rect(cell.x, cell.y, 20, 20)
                         if cell_rect.collidepoint(adjusted_mouse_x, adjusted_mouse_y):
                             self.selected_cell = cell
                             self.active_block = None
                             self.block_value = ""
+                            self.error = ""
                             self.scroll_y = 0  # Reset scroll when selecting new cell
                             return
 
@@ -1214,7 +455,7 @@ class cellEditUI:
                     block_height = 40
                     block_width = 65
                     blocks_per_row = 1
-                    genes = ";".join(self.selected_cell.genes).split(";")
+                    genes = geneBlocks(self.selected_cell.genes)
                     for i in range(0, len(genes), 2):
                         row = (i//2) // blocks_per_row
                         col = (i//2) % blocks_per_row
@@ -1229,243 +470,345 @@ class cellEditUI:
                             
                             if block_rect.collidepoint(mouse_x, mouse_y):
                                 self.active_block = i + j
-                                genes = ";".join(self.selected_cell.genes).split(";")
                                 self.block_value = genes[i + j]
                                 return
 
         elif event.type == pygame.KEYDOWN and self.active_block is not None:
             if event.key == pygame.K_RETURN:
                 if self.block_value:
-                    genes = ";".join(self.selected_cell.genes).split(";") # type: ignore
-                    genes[self.active_block] = self.block_value
-                    gene_pairs = [';'.join(genes[i:i+2]) for i in range(0, len(genes), 2)]
-                    self.selected_cell.genes = gene_pairs # type: ignore
+                    # Only the gene holding the block is sent, as one change
+                    index = self.active_block // 2
+                    blocks = geneBlocks(self.selected_cell.genes[index:index + 1]) # type: ignore
+                    blocks[self.active_block % 2] = self.block_value
+                    try:
+                        gene, = genesFromBlocks(blocks)
+                    except ValueError as e:
+                        # Malformed genes never reach the cell, the editor says why
+                        self.error = str(e)
+                    else:
+                        sim.editGene(self.selected_cell, index, gene)
+                        self.error = ""
                 self.active_block = None
                 self.block_value = ""
             elif event.key == pygame.K_UP:
-                current_value = int(self.block_value)
-                self.block_value = str(min(9, current_value + 1))
+                self.block_value = stepBlock(self.block_value, 1)
             elif event.key == pygame.K_DOWN:
-                current_value = int(self.block_value)
-                self.block_value = str(max(0, current_value - 1))
+                self.block_value = stepBlock(self.block_value, -1)
     
     def isMouseOver(self):
         mouse_x, _ = pygame.mouse.get_pos()
         return self.x <= mouse_x <= self.x + 170
 
-clock = pygame.time.Clock()
-running = True
-offset_x = 0
-offset_y = 0
-pan_velocity_x = 0
-pan_velocity_y = 0
-zoom = 1.0
-target_zoom = 1.0
-dragging = False
-last_mouse_pos = None
-FPSs = []
-particles = []
-lasers = []
-editUI = cellEditUI()
-ugmGen = UGMGenerator()
 
-for _ in range(500):
-    valid = False
-    while not valid:
-        x = random.randint(0, 550)
-        y = random.randint(0, 550)
-        particle = Particle(x, y, ternary(random.random() > 0.5, "food", "waste"), 2)
-        
-        # Check if particle is inside any cell
-        in_cell = False
-        for cell in cells:
-            if x >= cell.x and x <= cell.x + 20 and y >= cell.y and y <= cell.y + 20:
-                in_cell = True
-                break
-        
-        if not in_cell:
-            valid = True
-            particles.append(particle)
+def playSplash():
+    animationTime = 8 # seconds
+    passed = 0
 
-animationTime = 8 # seconds
-passed = 0
+    def skip():
+        nonlocal passed
+        passed = animationTime
 
-skipBtn = Button(350, 400, 100, 50, (0, 0, 0),"Skip", lambda: globals().update({'passed': 8}))
+    skipBtn = Button(350, 400, 100, 50, (0, 0, 0),"Skip", skip)
 
-while passed < animationTime:
-    dt = clock.tick(144) / 1000
-    passed += dt
-    skipBtn.handleEvents()
-    
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-    
-    screen.fill((0, 0, 0))
-    
-    if passed < 6:
-        value = min(255,int(255 * (passed / 5)))
-        fadeInColor = (value, value, value)
+    while passed < animationTime:
+        dt = clock.tick(144) / 1000
+        passed += dt
+        skipBtn.handleEvents()
+        
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        
+        screen.fill((0, 0, 0))
+        
+        if passed < 6:
+            value = min(255,int(255 * (passed / 5)))
+            fadeInColor = (value, value, value)
+        else:
+            value = min(255,int(255 * (1 - ((passed-6) / 2))))
+            fadeInColor = (value, value, value)
+        
+        skipBtn.color = fadeInColor # type: ignore
+        skipBtn.draw(screen)
+        
+        write_text(screen, "Developed by", 400, 250, fadeInColor, 120)
+        write_text(screen, "Natch", 400, 350, fadeInColor, 120)
+        write_text(screen, "Immune System Simulator © 2025 by Nathaniel Cole is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/. View more in the LICENSE file.", 400, 580, fadeInColor, 12)
+        
+        pygame.draw.rect(screen, (180, 180, 180), (0, 0, (passed / animationTime) * 800, 4))
+        
+        pygame.display.flip()
+
+def runInteractive(seed=None, record=None, replay=None, fromStep=0, restored=None, autosave=None, profileTrace=None, dt=1/60):
+    # dt: seconds of simulation time per step, the world always moves in
+    # steps this size however fast frames are drawn.
+    # record: path to save a recording of this session to on exit.
+    # replay: a Replayer to watch instead of a live world, starting at fromStep.
+    # restored: a world loaded from a checkpoint to carry on with.
+    # autosave: called with the world after every step.
+    # profileTrace: path to export the profiler's last frames to on exit
+    # (profiling starts switched on).
+    global world, sim, snapshot, screen, clock, offset_x, offset_y, zoom, cellEditMode, ugmMode
+
+    pygame.init()
+    clock = pygame.time.Clock()
+    screen = pygame.display.set_mode((800, 600))
+    pygame.display.set_caption("Cell Simulation - Natch")
+
+    recording = None
+    if replay:
+        replay.skipTo(fromStep)
+        world = replay.world
+    elif restored:
+        world = restored
     else:
-        value = min(255,int(255 * (1 - ((passed-6) / 2))))
-        fadeInColor = (value, value, value)
-    
-    skipBtn.color = fadeInColor # type: ignore
-    skipBtn.draw(screen)
-    
-    write_text(screen, "Developed by", 400, 250, fadeInColor, 120)
-    write_text(screen, "Natch", 400, 350, fadeInColor, 120)
-    write_text(screen, "Immune System Simulator © 2025 by Nathaniel Cole is licensed under CC BY-NC-SA 4.0. To view a copy of this license, visit https://creativecommons.org/licenses/by-nc-sa/4.0/. View more in the LICENSE file.", 400, 580, fadeInColor, 12)
-    
-    pygame.draw.rect(screen, (180, 180, 180), (0, 0, (passed / animationTime) * 800, 4))
-    
-    pygame.display.flip()
-
-while running:
-    dt = clock.tick(1000) / 1000.0
-    passed += dt
-    
-    for event in pygame.event.get():
-        editUI.handleEvents(event)
-        ugmGen.handleEvents(event)
-        if event.type == pygame.QUIT:
-            running = False
-            pygame.quit()
-            sys.exit()
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                if not ugmGen.placing:
-                    dragging = True
-                    last_mouse_pos = event.pos
+        world = World(seed=seed)
+        if record:
+            recording = Recording.fromWorld(world)
+    lasers = LaserPool()
+    editUI = cellEditUI()
+    ugmGen = UGMGenerator()
+    sim = SimulationThread(world, dt, replay, recording, autosave)
+    snapshot = sim.take()
+    profiler.enabled = bool(profileTrace)
+    sim.send("profile", profiler.enabled)
+
+    playSplash()
+
+    sim.start()
+    try:
+        runLoop(lasers, editUI, ugmGen, bool(recording))
+    finally:
+        sim.stop()
+        if recording:
+            recording.save(record)
+            print(f"Saved {recording.steps} steps to {record}")
+        if profileTrace:
+            exportTrace(profileTrace, profiler, sim.profiler)
+            print(f"Saved a trace of the last {profiler.recorded()} frames and {sim.profiler.recorded()} steps to {profileTrace}")
+
+def runLoop(lasers, editUI, ugmGen, recording):
+    # The world is stepped by sim, this loop only reads its snapshots and
+    # sends it edits, so a slow frame never holds the simulation up (and a
+    # slow step never freezes the window).
+    global snapshot, offset_x, offset_y, zoom, cellEditMode, ugmMode
+
+    running = True
+    pan_velocity_x = 0
+    pan_velocity_y = 0
+    target_zoom = 1.0
+    dragging = False
+    last_mouse_pos = None
+    speed = 1
+    last_view = None
+    rate_time, rate_tick, rate = time.perf_counter(), snapshot.tick, 0.0  # Measured sim seconds per second
+
+    while running:
+        profiler.beginFrame()
+        clock.tick(display_fps if speed == 1 else warp_fps)
+        profiler.mark("wait")
+        if sim.error:
+            raise RuntimeError("The simulation thread stopped") from sim.error
+
+        snapshot = sim.take()
+        if editUI.selected_cell:
+            # The same cell in the new snapshot, None once it's died
+            editUI.selected_cell = snapshot.cellByHandle(editUI.selected_cell.handle)
+        
+        for event in pygame.event.get():
+            if not sim.replay:  # A replay can't take new edits or UGMs
+                editUI.handleEvents(event)
+                ugmGen.handleEvents(event)
+            if event.type == pygame.QUIT:
+                running = False
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1:
+                    if not ugmGen.placing:
+                        dragging = True
+                        last_mouse_pos = event.pos
+                        pan_velocity_x = 0
+                        pan_velocity_y = 0
+                elif event.button == 4:  # Mouse wheel up
+                    if not (cellEditMode and editUI.isMouseOver()):
+                        target_zoom *= 1.1
+                elif event.button == 5:  # Mouse wheel down
+                    if not (cellEditMode and editUI.isMouseOver()):
+                        target_zoom *= 0.9
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button == 1:
+                    dragging = False
+            elif event.type == pygame.MOUSEMOTION:
+                if dragging and last_mouse_pos:
+                    current_pos = event.pos
+                    dx = (current_pos[0] - last_mouse_pos[0]) / zoom
+                    dy = (current_pos[1] - last_mouse_pos[1]) / zoom
+                    offset_x += dx
+                    offset_y += dy
+                    pan_velocity_x = dx * 0.98
+                    pan_velocity_y = dy * 0.98
+                    last_mouse_pos = current_pos
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    if pygame.key.get_mods() & pygame.KMOD_SHIFT:
+                        ugmMode = not ugmMode
+                    else:
+                        cellEditMode = not cellEditMode
+                elif event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                    sim.send("profile", profiler.enabled)
+                elif event.key in speeds:
+                    speed = speeds[event.key]
+                    sim.send("speed", speed)
+                elif event.key == pygame.K_r:
+                    # Reset zoom and offset
+                    zoom = 1.0
+                    target_zoom = 1.0
                     pan_velocity_x = 0
                     pan_velocity_y = 0
-            elif event.button == 4:  # Mouse wheel up
-                if not (cellEditMode and editUI.isMouseOver()):
-                    target_zoom *= 1.1
-            elif event.button == 5:  # Mouse wheel down
-                if not (cellEditMode and editUI.isMouseOver()):
-                    target_zoom *= 0.9
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                dragging = False
-        elif event.type == pygame.MOUSEMOTION:
-            if dragging and last_mouse_pos:
-                current_pos = event.pos
-                dx = (current_pos[0] - last_mouse_pos[0]) / zoom
-                dy = (current_pos[1] - last_mouse_pos[1]) / zoom
-                offset_x += dx
-                offset_y += dy
-                pan_velocity_x = dx * 0.98
-                pan_velocity_y = dy * 0.98
-                last_mouse_pos = current_pos
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                if pygame.key.get_mods() & pygame.KMOD_SHIFT:
-                    ugmMode = not ugmMode
-                else:
-                    cellEditMode = not cellEditMode
-            elif event.key == pygame.K_ESCAPE:
-                running = False
-            elif event.key == pygame.K_r:
-                # Reset zoom and offset
-                zoom = 1.0
-                target_zoom = 1.0
-                pan_velocity_x = 0
-                pan_velocity_y = 0
-                offset_x = 0
-                offset_y = 0
-    
-    # Check if mouse has been stationary
-    current_time = pygame.time.get_ticks() / 1000.0  # Convert to seconds
-    if 'last_mouse_move_time' not in locals():
-        last_mouse_move_time = current_time
-    
-    mouse_pos = pygame.mouse.get_pos()
-    if 'last_mouse_check_pos' not in locals():
-        last_mouse_check_pos = mouse_pos
-    
-    if mouse_pos != last_mouse_check_pos: # type: ignore
-        last_mouse_move_time = current_time
-        last_mouse_check_pos = mouse_pos
-    elif current_time - last_mouse_move_time > 0.75: # type: ignore
-        pan_velocity_x = 0
-        pan_velocity_y = 0
-
-    # Smooth zoom interpolation
-    # Get mouse position before zoom
-    mouse_x, mouse_y = pygame.mouse.get_pos()
-    world_x = (mouse_x - offset_x * zoom) / zoom
-    world_y = (mouse_y - offset_y * zoom) / zoom
-    
-    # Apply zoom
-    old_zoom = zoom
-    zoom = zoom + (target_zoom - zoom) * 0.1
-    target_zoom = min(64, max(0.1, target_zoom))
-    
-    # Adjust offset to keep mouse position fixed
-    offset_x = -(world_x * zoom - mouse_x) / zoom
-    offset_y = -(world_y * zoom - mouse_y) / zoom  
-    
-    if not dragging:
-        offset_x += pan_velocity_x
-        offset_y += pan_velocity_y
-        pan_velocity_x *= 0.95
-        pan_velocity_y *= 0.95
-        
-        if abs(pan_velocity_x) < 0.1: pan_velocity_x = 0
-        if abs(pan_velocity_y) < 0.1: pan_velocity_y = 0
-    
-    tick += dt
-
-    # This is the entire draw loop.
-    screen.fill((255, 255, 255))
-    for cell in cells:
-        cell.draw(screen, offset_x, offset_y, zoom)
-        cell.update()
-    
-    for particle in particles:
-        if not isinstance(particle, Particle): print(f"Non-particle type found. {particle}"); continue
-        if particle.update(550, 550):
-            particles.remove(particle)
-        particle.draw(screen, offset_x, offset_y, zoom)
-    
-    for laser in lasers:
-        laser.draw(screen, offset_x, offset_y, zoom)
-    
-    foods = [particle for particle in particles if particle.type == "food"]
-    wastes = [particle for particle in particles if particle.type == "waste"]
-    
-    foodWasteRatio = len(foods) / len(wastes)
-    
-    # Use the foodwaste ratio to determine how much waste to transmute to food
-    if foodWasteRatio < 0.5:  # If there's too much waste compared to food
-        conversion_chance = 0.3 * (1 - foodWasteRatio/0.5)  # More conversion chance when ratio is lower
-        for waste in wastes[:10]:  # Convert up to 10 waste particles at a time
-            if random.random() < conversion_chance:  # Weighted chance based on ratio
-                waste.type = "food"
-                waste.color = (255, 0, 0)  # Change color to red for food
-        
-    if foodWasteRatio < 0.3:
-        write_text(screen, "Food: LOW", 10, 10, left=True)
-    elif foodWasteRatio < 0.5:
-        write_text(screen, "Food: OK", 10, 10, left=True)
-    elif foodWasteRatio > 1.6:
-        write_text(screen, "Food: ABUNDANT", 10, 10, left=True)
-    elif foodWasteRatio > 1:
-        write_text(screen, "Food: HIGH", 10, 10, left=True)
+                    offset_x = 0
+                    offset_y = 0
+        
+        # Check if mouse has been stationary
+        current_time = pygame.time.get_ticks() / 1000.0  # Convert to seconds
+        if 'last_mouse_move_time' not in locals():
+            last_mouse_move_time = current_time
+        
+        mouse_pos = pygame.mouse.get_pos()
+        if 'last_mouse_check_pos' not in locals():
+            last_mouse_check_pos = mouse_pos
+        
+        if mouse_pos != last_mouse_check_pos: # type: ignore
+            last_mouse_move_time = current_time
+            last_mouse_check_pos = mouse_pos
+        elif current_time - last_mouse_move_time > 0.75: # type: ignore
+            pan_velocity_x = 0
+            pan_velocity_y = 0
+
+        # Smooth zoom interpolation
+        # Get mouse position before zoom
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        world_x = (mouse_x - offset_x * zoom) / zoom
+        world_y = (mouse_y - offset_y * zoom) / zoom
+        
+        # Apply zoom
+        old_zoom = zoom
+        zoom = zoom + (target_zoom - zoom) * 0.1
+        target_zoom = min(64, max(0.1, target_zoom))
+        
+        # Adjust offset to keep mouse position fixed
+        offset_x = -(world_x * zoom - mouse_x) / zoom
+        offset_y = -(world_y * zoom - mouse_y) / zoom  
+        
+        if not dragging:
+            offset_x += pan_velocity_x
+            offset_y += pan_velocity_y
+            pan_velocity_x *= 0.95
+            pan_velocity_y *= 0.95
+            
+            if abs(pan_velocity_x) < 0.1: pan_velocity_x = 0
+            if abs(pan_velocity_y) < 0.1: pan_velocity_y = 0
+        if snapshot.view:
+            offset_x, offset_y, zoom = snapshot.view
+            target_zoom = zoom
+        elif recording and (offset_x, offset_y, zoom) != last_view:
+            last_view = (offset_x, offset_y, zoom)
+            sim.send("view", *last_view)
+        profiler.mark("input")
+
+        # Particles are drawn between the snapshot's step and the next one,
+        # by how far through it the simulation should be by now, so motion
+        # stays smooth when more frames are drawn than steps are taken
+        now = time.perf_counter()
+        alpha = min(1.0, (now - snapshot.wallTime) * snapshot.speed / snapshot.dt) if snapshot.speed == 1 else 1.0
+        if now - rate_time >= 0.5:
+            rate = (snapshot.tick - rate_tick) / (now - rate_time)
+            rate_time, rate_tick = now, snapshot.tick
+
+        # This is the entire draw loop.
+        screen.fill((255, 255, 255))
+        drawWorld(screen, snapshot, lasers, offset_x, offset_y, zoom, profiler, alpha)
+        
+        foodWasteRatio = snapshot.foodWasteRatio
+        if foodWasteRatio < 0.3:
+            write_text(screen, "Food: LOW", 10, 10, left=True)
+        elif foodWasteRatio < 0.5:
+            write_text(screen, "Food: OK", 10, 10, left=True)
+        elif foodWasteRatio > 1.6:
+            write_text(screen, "Food: ABUNDANT", 10, 10, left=True)
+        elif foodWasteRatio > 1:
+            write_text(screen, "Food: HIGH", 10, 10, left=True)
+        else:
+            write_text(screen, "Food: OK", 10, 10, left=True)   
+        
+        write_text(screen, "Food/Waste: {:.2f}".format(foodWasteRatio), 10, 30, left=True)
+        write_text(screen, "Tick: {:.2f}".format(snapshot.tick), 10, 50, left=True)
+        write_text(screen, "Speed: {} ({:.1f}x)".format("max" if speed is None else f"{speed}x", rate), 10, 70, left=True)
+        census = snapshot.census
+        write_text(screen, "Cells: {}  Food: {}  Waste: {}".format(census.cells, census.food, census.waste), 10, 90, left=True)
+        
+        editUI.draw(screen)
+        ugmGen.draw(screen)
+        
+        write_text(screen, f"FPS: {int(clock.get_fps())}", 400, 10)
+        FPSGraph()
+        profiler.mark("panels")
+
+        if profiler.enabled:
+            drawProfiler(screen, profiler, screen.get_width() - 440, screen.get_height() - 130)
+            drawProfiler(screen, sim.profiler, screen.get_width() - 440, screen.get_height() - 260)
+            profiler.mark("overlay")
+        
+        pygame.display.flip()
+        profiler.mark("flip")
+        profiler.endFrame()
+
+    pygame.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cell Simulation - Natch")
+    parser.add_argument("--headless", action="store_true", help="run the simulation without opening a window")
+    parser.add_argument("--steps", type=int, default=1000, help="number of steps to run in headless mode")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the world")
+    parser.add_argument("--dt", type=float, default=1/60, help="seconds of simulation time per step")
+    parser.add_argument("--lod-zoom", type=float, default=cellRender.lod_zoom, help="zoom below which cells and particles are drawn in low detail")
+    parser.add_argument("--record", metavar="PATH", help="save a replayable recording of the run to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recording instead of starting a new world")
+    parser.add_argument("--from-step", type=int, default=0, help="with --replay, skip ahead to this step before showing it (headless: stop there)")
+    parser.add_argument("--restore", metavar="PATH", help="carry on from a checkpoint instead of starting a new world")
+    parser.add_argument("--checkpoint", metavar="PATH", help="save checkpoints of the world to PATH (headless: also at the end)")
+    parser.add_argument("--checkpoint-every", type=int, default=36000, help="steps between checkpoints")
+    parser.add_argument("--profile-trace", metavar="PATH", help="profile from the start and save a Chrome trace of the last frames to PATH on exit")
+    args = parser.parse_args()
+    cellRender.lod_zoom = args.lod_zoom
+    if args.restore and (args.record or args.replay):
+        parser.error("--restore can't be combined with --record or --replay")
+
+    autosave = Autosave(args.checkpoint, args.checkpoint_every) if args.checkpoint else None
+    restored = loadCheckpoint(args.restore) if args.restore else None
+
+    if args.replay:
+        replay = Replayer(Recording.load(args.replay))
+        if args.headless:
+            start = time.perf_counter()
+            replay.skipTo(args.from_step or replay.recording.steps)
+            printStats(replay.world, replay.steps, time.perf_counter() - start)
+        else:
+            runInteractive(replay=replay, fromStep=args.from_step, profileTrace=args.profile_trace)
+    elif args.headless:
+        world = restored or World(seed=args.seed)
+        recording = Recording.fromWorld(world) if args.record else None
+        runHeadless(args.steps, dt=args.dt, world=world, afterStep=autosave)
+        if recording:
+            recording.save(args.record)
+        if autosave:
+            saveCheckpoint(world, args.checkpoint)
     else:
-        write_text(screen, "Food: OK", 10, 10, left=True)   
-    
-    write_text(screen, "Food/Waste: {:.2f}".format(foodWasteRatio), 10, 30, left=True)
-    write_text(screen, "Tick: {:.2f}".format(tick), 10, 50, left=True)
-    
-    editUI.draw(screen)
-    ugmGen.draw(screen)
-    
-    write_text(screen, f"FPS: {int(clock.get_fps())}", 400, 10)
-    FPSGraph()
-    
-    pygame.display.flip()
+        runInteractive(args.seed, args.record, restored=restored, autosave=autosave, profileTrace=args.profile_trace, dt=args.dt)
 
-pygame.quit()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from collections import namedtuple
+
+import numpy as np
+
+from cellWorld import Cell, SpatialGrid, UGM
+
+# Read-only copies of a World for the window to draw while the simulation
+# carries on stepping the real one on another thread (see cellThread). A
+# snapshot has the attributes drawWorld and the panels read from a world
+# (tick, cells, grid.query, store columns, laserEvents, ...) and is never
+# changed after it's published, apart from the renderer taking its
+# laserEvents.
+#
+# Copying every cell for every snapshot would cost more than a step on big
+# sponges, so SnapshotBuilder keeps the copy of each cell and only makes a
+# new one when the cell has changed, and shares the grid's bucket layout
+# between snapshots until cells come or go.
+
+UGMView = namedtuple("UGMView", ["genes", "color", "radius"])
+
+class FrozenGenome:
+    # The parts of a Genome that are drawn and shown in the editor
+    __slots__ = ("genes", "health", "version", "__weakref__")
+
+    def __init__(self, genome):
+        self.genes = list(genome.genes)
+        self.health = list(genome.health)
+        self.version = genome.version
+
+    def __len__(self):
+        return len(self.genes)
+
+def freezeCell(cell):
+    # Same class and attributes, but its own genome copy and no contents.
+    # Walls never change, so they're shared as they are.
+    if not isinstance(cell, Cell):
+        return cell
+    view = Cell.__new__(Cell)
+    view.__dict__.update(cell.__dict__)
+    view.genome = FrozenGenome(cell.genome)
+    view.contents = {}
+    view.population = None
+    return view
+
+class ParticleSnapshot:
+    # The ParticleStore columns cut down to the live rows. proxies only has
+    # the UGMs, as UGMViews keyed by row.
+    def __init__(self, store):
+        n = store.count
+        self.count = n
+        self.x = store.x[:n].copy()
+        self.y = store.y[:n].copy()
+        self.px = store.px[:n].copy()
+        self.py = store.py[:n].copy()
+        self.type = store.type[:n].copy()
+        self.radius = store.radius[:n].copy()
+        self.alive = store.alive[:n].copy()
+        self.proxies = {}
+        for row in np.flatnonzero(self.type == UGM).tolist():
+            ugm = store.proxies[row]
+            self.proxies[row] = UGMView(tuple(ugm.genes), ugm.color, self.radius[row].item())
+
+class SnapshotGrid:
+    # grid.query() over a snapshot's cells. layout is a SpatialGrid whose
+    # buckets hold positions in cells rather than the cells themselves.
+    def __init__(self, layout, cells):
+        self.layout = layout
+        self.cells = cells
+
+    def query(self, left, top, right, bottom):
+        cells = self.cells
+        for index in self.layout.query(left, top, right, bottom):
+            yield cells[index]
+
+class WorldSnapshot:
+    # extra: anything else the window needs from the simulation thread
+    # (speed, step size, wall clock time of the step, replay camera)
+    def __init__(self, world, cells, layout, laserEvents, **extra):
+        self.seed = world.seed
+        self.tick = world.tick
+        self.timeMs = world.timeMs
+        self.width = world.width
+        self.height = world.height
+        self.foodWasteRatio = world.foodWasteRatio
+        self.census = world.population.census()
+        self.cells = cells
+        self.grid = SnapshotGrid(layout, cells)
+        self.store = ParticleSnapshot(world.store)
+        self.laserEvents = laserEvents
+        self.__dict__.update(extra)
+        self._byHandle = None
+
+    def cellByHandle(self, handle):
+        if self._byHandle is None:
+            self._byHandle = {cell.handle: cell for cell in self.cells}
+        return self._byHandle.get(handle)
+
+class SnapshotBuilder:
+    # Makes successive snapshots of one world. Only call between steps.
+    def __init__(self):
+        self._frozen = {}  # Cell handle -> (genome, version, membraneHealth, doIn, frozen cell)
+        self._layout = None
+        self._layoutKey = None
+
+    def build(self, world, laserEvents=(), **extra):
+        world.catchUp()
+        frozen = self._frozen
+        cells = []
+        for cell in world.cells:
+            if not isinstance(cell, Cell):
+                cells.append(cell)
+                continue
+            genome = cell.genome
+            entry = frozen.get(cell.handle)
+            if entry is None or entry[0] is not genome or entry[1] != genome.version or entry[2] != cell.membraneHealth or entry[3] != cell.doIn:
+                entry = frozen[cell.handle] = (genome, genome.version, cell.membraneHealth, cell.doIn, freezeCell(cell))
+            cells.append(entry[4])
+
+        # Cells never move, so the layout only changes when some are added
+        # or removed (removals change the count, additions the next handle)
+        layoutKey = (len(world.cells), world.nextCellHandle)
+        if layoutKey != self._layoutKey:
+            layout = SpatialGrid()
+            for index, cell in enumerate(world.cells):
+                layout.buckets.setdefault(layout.bucketOf(cell.x, cell.y), []).append(index)
+            self._layout, self._layoutKey = layout, layoutKey
+            living = {cell.handle for cell in world.cells}
+            for handle in [handle for handle in frozen if handle not in living]:
+                del frozen[handle]
+        return WorldSnapshot(world, cells, self._layout, list(laserEvents), **extra)
@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+
+from cellProfile import Profiler
+from cellSnapshot import SnapshotBuilder
+
+# Runs a World on its own thread so drawing and stepping don't hold each
+# other up. The window never touches the world: it draws the latest
+# WorldSnapshot (take()) and sends everything that should change the world
+# through a command queue, which is drained between steps:
+#   ("gene", cellHandle, index, gene)   World.editGenes on one gene: replaced,
+#                                       appended (index == len) or removed (None)
+#   ("ugm", x, y, velx, vely, genes)    World.placeUGM
+#   ("view", offset_x, offset_y, zoom)  camera, logged to the recording
+#   ("speed", speed)                    time warp, None runs flat out
+#   ("profile", enabled)                switch the step profiler on or off
+#
+# Snapshots are double-buffered: the one the window holds stays untouched
+# while the next is made, and a new one is only made once the window has
+# taken the last, so building them costs at most one per drawn frame.
+#
+# The thread keeps the fixed-timestep accumulator, so the world moves in
+# steps of dt (a replay in its recorded steps) at `speed` times real time.
+
+simPhases = ("commands", "cells", "particles", "transmutation", "snapshot")
+max_lag = 0.25  # Seconds the world may fall behind before the rest is dropped
+max_lasers = 256  # Most laser events kept for the next snapshot while warping
+
+class SimulationThread:
+    def __init__(self, world, dt=1/60, replay=None, recording=None, autosave=None):
+        self.world = world
+        self.dt = dt
+        self.replay = replay
+        self.recording = recording
+        self.autosave = autosave
+        self.speed = 1
+        self.commands = queue.Queue()
+        self.profiler = Profiler(phases=simPhases, name="simulation")
+        self.error = None  # Exception that stopped the thread, if any
+        self._builder = SnapshotBuilder()
+        self._lasers = []
+        self._latest = None
+        self._taken = True
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        world.profiler = self.profiler
+        self._publish()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        # Waits for the step in progress, after which the world is safe to use
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def send(self, *command):
+        self.commands.put(command)
+
+    def editGene(self, cell, index, gene):
+        # Sent as the one change rather than a whole genome, so it lands on
+        # the cell as it is by then, edits made since the snapshot included
+        self.send("gene", cell.handle, index, gene)
+
+    def placeUGM(self, x, y, velx, vely, genes):
+        self.send("ugm", x, y, velx, vely, list(genes))
+
+    def take(self):
+        # Latest snapshot, the next one is made after the next step
+        with self._lock:
+            self._taken = True
+            return self._latest
+
+    def _publish(self):
+        replay = self.replay
+        snapshot = self._builder.build(self.world, self._lasers, dt=self.dt, speed=self.speed,
+                                       wallTime=time.perf_counter(), view=replay.view if replay else None)
+        self._lasers = []
+        with self._lock:
+            self._latest = snapshot
+            self._taken = False
+
+    def _apply(self, command):
+        kind = command[0]
+        if kind == "gene":
+            cell = self.world.cellByHandle(command[1])
+            index, gene = command[2:]
+            if cell is not None and cell.alive and index <= len(cell.genes):
+                genes = list(cell.genes)
+                genes[index:index + 1] = [] if gene is None else [gene]
+                if genes:
+                    self.world.editGenes(cell, genes)
+        elif kind == "ugm":
+            self.world.placeUGM(*command[1:])
+        elif kind == "view":
+            if self.recording:
+                self.recording.view(*command[1:])
+        elif kind == "speed":
+            self.speed = command[1]
+        elif kind == "profile":
+            if self.profiler.enabled != command[1]:
+                self.profiler.toggle()
+
+    def _nextDt(self):
+        return self.replay.nextDt if self.replay else self.dt
+
+    def _drain(self):
+        # Apply every queued command, True if there were any
+        applied = False
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return applied
+            self._apply(command)
+            applied = True
+
+    def _step(self, dt):
+        self.profiler.beginFrame()
+        self._drain()
+        self.profiler.mark("commands")
+        if self.replay:
+            self.replay.stepOnce()
+        else:
+            self.world.step(dt)
+            if self.autosave:
+                self.autosave(self.world)
+        self._lasers.extend(self.world.laserEvents)
+        del self._lasers[:-max_lasers]
+        if self._taken:
+            self._publish()
+        self.profiler.mark("snapshot")
+        self.profiler.endFrame()
+
+    def _wait(self, seconds):
+        # Commands still get applied (and shown) while waiting for the next step
+        if self._drain() and self._taken:
+            self._publish()
+        time.sleep(seconds)
+
+    def _run(self):
+        try:
+            accumulator = 0.0
+            speed = self.speed
+            last = time.perf_counter()
+            while not self._stopping.is_set():
+                now = time.perf_counter()
+                elapsed, last = now - last, now
+                if self.speed != speed:
+                    speed, accumulator = self.speed, 0.0
+                dt = self._nextDt()
+                if dt is None:
+                    self._wait(0.01)  # The end of a replay
+                elif speed is None:
+                    self._step(dt)
+                else:
+                    accumulator = min(accumulator + elapsed * speed, max(max_lag * speed, dt))
+                    if accumulator >= dt:
+                        accumulator -= dt
+                        self._step(dt)
+                    else:
+                        self._wait(min(0.002, (dt - accumulator) / speed))
+        except Exception as error:
+            self.error = error
+            raise
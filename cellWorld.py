@@ -0,0 +1,1458 @@
+import math
+import os
+import random
+import time
+from bisect import bisect_right, insort
+from collections import namedtuple
+
+import numpy as np
+
+# Pure simulation core. Nothing in here may import or call pygame so the
+# world can be stepped headless (batch runs, servers without a display).
+
+ternary = lambda a, b, c: b if a else c
+cell_size = 20
+half_size = cell_size / 2
+damping = 0.9  # Reduces jitter post-collision
+friction = 0.99  # General velocity damping
+world_width = 550  # Particles wrap around at these bounds
+world_height = 550
+
+gene_codes = 9  # Genes use the digits 0-8 for both halves (one colour each in the renderer)
+
+# A gene string such as '6;8', '4;6a', '4;4(1;1.3;3)' or '4;5(-1.3)' decoded
+# once into action, target and argument (the grammar is in DNA.txt). arg is
+# None, a LANDMARK selector letter a-z ('a' weakest, 'b' strongest, the rest
+# unused so far) or a (start, end) pair for DNA[x to y], each end a Gene or
+# a position number.
+Gene = namedtuple("Gene", ["action", "target", "arg", "text"])
+
+def _rangeEnd(text):
+    if text.lstrip("-").isdigit():
+        return int(text)
+    return compileGene(text)
+
+def compileGene(text):
+    action, separator, target = str(text).partition(";")
+    if not separator or len(action) != 1 or not action.isdigit() or not target or not target[0].isdigit():
+        raise ValueError(f"Malformed gene: {text!r}")
+    action = int(action)
+    rest = target[1:]
+    target = int(target[0])
+    if action >= gene_codes or target >= gene_codes:
+        raise ValueError(f"Unknown gene code in {text!r}")
+
+    arg = None
+    if len(rest) == 1 and "a" <= rest <= "z" and target == 6:
+        arg = rest
+    elif rest.startswith("(") and rest.endswith(")") and target in (4, 5):
+        start, dot, end = rest[1:-1].partition(".")
+        try:
+            if not dot:
+                raise ValueError
+            arg = (_rangeEnd(start), _rangeEnd(end))
+        except ValueError:
+            raise ValueError(f"Malformed gene range in {text!r}") from None
+    elif rest:
+        raise ValueError(f"Malformed gene argument in {text!r}")
+    return Gene(action, target, arg, str(text))
+
+def compileGenome(texts):
+    return [compileGene(text) for text in texts]
+
+defaultGenome = compileGenome(['6;8', '3;3', '3;3', '1;1', '6;7', '2;2', '4;6a', '5;6a'])
+
+class Genome:
+    # A cell's genes and their health kept side by side by position. A
+    # segment tree over positions finds the weakest/strongest gene in
+    # O(log n) (ties go to the earliest position, like min()/max() did), and
+    # each distinct gene maps to its sorted positions so finding where one
+    # first appears is a dict lookup instead of a list.index scan. version
+    # goes up with every change, so copies of it can tell they're stale.
+    def __init__(self, genes, health=None):
+        self.genes = list(genes)
+        self.health = list(health) if health is not None else [100] * len(self.genes)
+        self.version = 0
+        self._build()
+
+    def __len__(self):
+        return len(self.genes)
+
+    def __iter__(self):
+        return iter(self.genes)
+
+    def __getitem__(self, index):
+        return self.genes[index]
+
+    def _build(self):
+        size = 1
+        while size < len(self.genes):
+            size *= 2
+        self._size = size
+        self._weakest = [-1] * (2 * size)
+        self._strongest = [-1] * (2 * size)
+        for i in range(len(self.genes)):
+            self._weakest[size + i] = i
+            self._strongest[size + i] = i
+        for node in range(size - 1, 0, -1):
+            self._pull(node)
+
+        self._positions = {}
+        for i, gene in enumerate(self.genes):
+            self._positions.setdefault(gene, []).append(i)
+
+    def _pick(self, left, right, stronger):
+        # left always holds earlier positions, so it wins ties
+        if left < 0:
+            return right
+        if right < 0:
+            return left
+        if stronger:
+            return right if self.health[right] > self.health[left] else left
+        return right if self.health[right] < self.health[left] else left
+
+    def _pull(self, node):
+        self._weakest[node] = self._pick(self._weakest[2 * node], self._weakest[2 * node + 1], False)
+        self._strongest[node] = self._pick(self._strongest[2 * node], self._strongest[2 * node + 1], True)
+
+    def damage(self, index, amount):
+        self.health[index] -= amount
+        self.version += 1
+        node = (self._size + index) // 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+    def weakest(self):
+        return self._weakest[1] if self.genes else None
+
+    def strongest(self):
+        return self._strongest[1] if self.genes else None
+
+    def indexOf(self, gene):
+        positions = self._positions.get(gene)
+        return positions[0] if positions else None
+
+    def replace(self, index, gene):
+        # Swaps the gene in one slot; the slot keeps its health
+        old = self.genes[index]
+        positions = self._positions[old]
+        positions.remove(index)
+        if not positions:
+            del self._positions[old]
+        insort(self._positions.setdefault(gene, []), index)
+        self.genes[index] = gene
+        self.version += 1
+
+    def insert(self, index, genes, health=100):
+        self.genes[index:index] = genes
+        self.health[index:index] = [health] * len(genes)
+        self.version += 1
+        self._build()
+
+    def remove(self, index):
+        del self.genes[index]
+        del self.health[index]
+        self.version += 1
+        self._build()
+
+    def copy(self):
+        # Same genes and health, without rebuilding the indexes
+        genome = Genome.__new__(Genome)
+        genome.genes = self.genes[:]
+        genome.health = self.health[:]
+        genome.version = 0
+        genome._size = self._size
+        genome._weakest = self._weakest[:]
+        genome._strongest = self._strongest[:]
+        genome._positions = {gene: positions[:] for gene, positions in self._positions.items()}
+        return genome
+
+def generateMergerSponge(size):
+    # Open squares are True. Each level is the Kronecker product of the 3x3
+    # pattern with the level below, so depth n is n NumPy calls.
+    pattern = np.array([[1, 1, 1], [1, 0, 1], [1, 1, 1]], dtype=bool)
+    sponge = np.ones((1, 1), dtype=bool)
+    while len(sponge) < size:
+        sponge = np.kron(pattern, sponge)
+    return sponge
+
+OPEN, CELL, WALL = range(3)
+layout_cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".layout_cache")
+
+def spongeLayout(size):
+    # OPEN/CELL/WALL for every square of the sponge. A filled square is a
+    # Wall when none of its 8 neighbours is open, otherwise a Cell. Layouts
+    # are cached on disk by size since they never change. Written to a
+    # temporary file first so a process loading the cache while another one
+    # writes it never sees half a file.
+    path = os.path.join(layout_cache_dir, f"sponge-{size}.npy")
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+
+    sponge = generateMergerSponge(size)
+    padded = np.pad(sponge, 1).astype(np.int8)
+    height, width = sponge.shape
+    openNeighbours = sum(padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+                         for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+    layout = np.where(sponge, OPEN, np.where(openNeighbours == 0, WALL, CELL)).astype(np.int8)
+
+    try:
+        os.makedirs(layout_cache_dir, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as cache:
+            np.save(cache, layout)
+        os.replace(temporary, path)
+    except OSError:
+        pass  # Read-only install, just rebuild it next time
+    return layout
+
+class SpatialGrid:
+    # Buckets cells by the 20px grid so a particle only has to look at the
+    # 3x3 buckets around it instead of every cell in the world. Positions in
+    # the wrap margin (just outside 0..width) land in buckets that hold no
+    # cells, so wrapped particles simply see nothing there.
+    def __init__(self, bucketSize=cell_size):
+        self.bucketSize = bucketSize
+        self.buckets = {}
+        self._dense = None
+
+    def bucketOf(self, x, y):
+        return (int(x // self.bucketSize), int(y // self.bucketSize))
+
+    def insert(self, cell):
+        key = self.bucketOf(cell.x, cell.y)
+        self.buckets.setdefault(key, []).append(cell)
+        if self._dense is not None and not self._dense.add(key, cell):
+            self._dense = None
+
+    def remove(self, cell):
+        key = self.bucketOf(cell.x, cell.y)
+        bucket = self.buckets.get(key)
+        if bucket and cell in bucket:
+            bucket.remove(cell)
+            if not bucket:
+                del self.buckets[key]
+            if self._dense is not None and (bucket or not self._dense.remove(key, cell)):
+                self._dense = None
+
+    def query(self, left, top, right, bottom):
+        # Cells in every bucket overlapping the rectangle. A small rectangle
+        # only looks up its own buckets, a huge one just filters the
+        # occupied ones.
+        gx0, gy0 = self.bucketOf(left, top)
+        gx1, gy1 = self.bucketOf(right, bottom)
+        if (gx1 - gx0 + 1) * (gy1 - gy0 + 1) > len(self.buckets):
+            for (gx, gy), bucket in self.buckets.items():
+                if gx0 <= gx <= gx1 and gy0 <= gy <= gy1:
+                    yield from bucket
+            return
+        for gy in range(gy0, gy1 + 1):
+            for gx in range(gx0, gx1 + 1):
+                bucket = self.buckets.get((gx, gy))
+                if bucket:
+                    yield from bucket
+
+    def dense(self):
+        # Array form of the grid for the batched collision pass. Cells coming
+        # and going are patched into it; it's only rebuilt when one can't be
+        # (a new cell off its lookup, or two cells sharing a bucket).
+        if self._dense is None:
+            self._dense = DenseGrid(self)
+        return self._dense
+
+class DenseGrid:
+    # Snapshot of a SpatialGrid as NumPy arrays: solid i is solids[i] with its
+    # box in x/y/size, and lookup maps a bucket to the solid in it (or -1).
+    # Cells sit exactly on the 20px grid so a bucket never holds more than one.
+    # A DenseGrid rebuilt from another's arrays (fromArrays) has no solids
+    # list, only the arrays, which is all membraneContacts and
+    # containmentChanges need. version goes up every time add() or remove()
+    # changes it.
+    arrays = ("x", "y", "size", "isCell", "handle", "lookup")
+
+    def __init__(self, grid):
+        self.version = 0
+        self.solids = [cell for bucket in grid.buckets.values() for cell in bucket]
+        self.x = np.array([cell.x for cell in self.solids], dtype=float)
+        self.y = np.array([cell.y for cell in self.solids], dtype=float)
+        self.size = np.array([cell.size for cell in self.solids], dtype=float)
+        self.isCell = np.array([isinstance(cell, Cell) for cell in self.solids], dtype=bool)
+        self.handle = np.array([cell.handle for cell in self.solids], dtype=np.int64)
+
+        keys = np.array([grid.bucketOf(cell.x, cell.y) for cell in self.solids], dtype=np.int64).reshape(-1, 2)
+        if len(keys):
+            self.originX, self.originY = keys.min(axis=0)
+            width, height = keys.max(axis=0) - keys.min(axis=0) + 1
+        else:
+            self.originX, self.originY, width, height = 0, 0, 0, 0
+        self.lookup = np.full((height, width), -1, dtype=np.int64)
+        self.lookup[keys[:, 1] - self.originY, keys[:, 0] - self.originX] = np.arange(len(self.solids))
+
+    @classmethod
+    def fromArrays(cls, originX, originY, **arrays):
+        dense = cls.__new__(cls)
+        dense.version = 0
+        dense.solids = None
+        dense.originX, dense.originY = originX, originY
+        for name in cls.arrays:
+            setattr(dense, name, arrays[name])
+        return dense
+
+    def _index(self, key):
+        # lookup position of a bucket, or None if it's off the lookup
+        ix, iy = key[0] - self.originX, key[1] - self.originY
+        height, width = self.lookup.shape
+        return (iy, ix) if 0 <= ix < width and 0 <= iy < height else None
+
+    def add(self, key, solid):
+        # A new solid in an empty bucket on the lookup goes on the end of the
+        # arrays. Returns False if it has to be rebuilt instead.
+        index = self._index(key)
+        if index is None or self.lookup[index] >= 0:
+            return False
+        self.lookup[index] = len(self.solids)
+        self.solids.append(solid)
+        self.x = np.append(self.x, float(solid.x))
+        self.y = np.append(self.y, float(solid.y))
+        self.size = np.append(self.size, float(solid.size))
+        self.isCell = np.append(self.isCell, isinstance(solid, Cell))
+        self.handle = np.append(self.handle, solid.handle)
+        self.version += 1
+        return True
+
+    def remove(self, key, solid):
+        # The solid's bucket goes back to -1; its row stays in the arrays but
+        # nothing looks it up any more. Returns False if it wasn't there.
+        index = self._index(key)
+        if index is None or self.lookup[index] < 0 or self.solids[self.lookup[index]] is not solid:
+            return False
+        self.lookup[index] = -1
+        self.version += 1
+        return True
+
+    def at(self, gx, gy):
+        ix = gx - self.originX
+        iy = gy - self.originY
+        height, width = self.lookup.shape
+        onGrid = (ix >= 0) & (ix < width) & (iy >= 0) & (iy < height)
+        solid = np.full(len(gx), -1, dtype=np.int64)
+        solid[onGrid] = self.lookup[iy[onGrid], ix[onGrid]]
+        return solid
+
+def circleSquareContacts(px, py, reach, left, top, size):
+    # Closed-form circle vs axis-aligned square membrane test over arrays of
+    # pairs. Outside the square the nearest membrane point is the centre
+    # clamped to the box; inside it is the nearest edge. Returns which pairs
+    # touch plus the push-out normal (pointing at the particle) and depth.
+    right = left + size
+    bottom = top + size
+    closestX = np.clip(px, left, right)
+    closestY = np.clip(py, top, bottom)
+
+    inside = (px > left) & (px < right) & (py > top) & (py < bottom)
+    if inside.any():
+        toLeft = px[inside] - left[inside]
+        toRight = right[inside] - px[inside]
+        toTop = py[inside] - top[inside]
+        toBottom = bottom[inside] - py[inside]
+        sideways = np.minimum(toLeft, toRight) <= np.minimum(toTop, toBottom)
+        closestX[inside] = np.where(sideways, np.where(toLeft <= toRight, left[inside], right[inside]), px[inside])
+        closestY[inside] = np.where(sideways, py[inside], np.where(toTop <= toBottom, top[inside], bottom[inside]))
+
+    distanceX = px - closestX
+    distanceY = py - closestY
+    distance = np.hypot(distanceX, distanceY)
+    touching = distance < reach
+
+    # A centre exactly on the membrane gets pushed along +x, as before
+    apart = distance > 0
+    safe = np.where(apart, distance, 1)
+    normalX = np.where(apart, distanceX / safe, 1.0)
+    normalY = np.where(apart, distanceY / safe, 0.0)
+    return touching, normalX, normalY, reach - distance
+
+def resolveMembraneCollisions(world):
+    # Bounce every particle off the membranes in the 3x3 buckets around it
+    # (see membraneContacts), damage the membranes they hit and let UGMs
+    # inject their genes. Returns the UGMs used up by injecting into a cell.
+    store = world.store
+    dense = world.grid.dense()
+    n = store.count
+    if n == 0 or not dense.solids:
+        return []
+
+    return applyContacts(store, dense, *membraneContacts(store, dense, np.arange(n)))
+
+def applyContacts(store, dense, hitSolids, hits, infections):
+    # The object half: UGM injections in the order they happened, then the
+    # membrane damage. Returns the UGMs used up.
+    injected = []
+    for row, index in infections[:, 1:].tolist():
+        ugm = store.proxies[row]
+        dense.solids[index].inject(ugm.genes)
+        injected.append(ugm)
+    for index, damage in zip(hitSolids.tolist(), hits.tolist()):
+        dense.solids[index].membraneHealth -= damage
+    return injected
+
+def membraneContacts(store, dense, rows):
+    # The array half of the collision pass, for the given rows (ascending)
+    # of store. Neighbour buckets are visited in the same order the old
+    # per-particle loop used, one vectorised round each, and each particle
+    # has at most one candidate per round. Only the rows' own columns are
+    # written, so disjoint sets of rows can be done separately (see
+    # cellParallel) and come out the same as all at once. Returns the solids
+    # hit with their hit counts, and (round, row, solid) for every UGM that
+    # touched a cell, in the order they touched.
+    x, y = store.x, store.y
+    velx, vely = store.velx, store.vely
+    types = store.type
+    reach = store.radius[rows] + 1  # 1 pixel for membrane thickness
+    gx = (x[rows] // cell_size).astype(np.int64)
+    gy = (y[rows] // cell_size).astype(np.int64)
+
+    hitSolids = []
+    consumed = ~store.alive[rows]  # Tombstoned rows take no part
+    infections = []
+    for round, (dy, dx) in enumerate((dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)):
+        solid = dense.at(gx + dx, gy + dy)
+        local = np.flatnonzero((solid >= 0) & ~consumed)
+        if not len(local):
+            continue
+        solid = solid[local]
+        picked = rows[local]
+
+        # Food passes freely into cells and only bounces off the
+        # membrane of the cell it is inside
+        inside = (store.bx[picked] == gx[local] + dx) & (store.by[picked] == gy[local] + dy)
+        passes = dense.isCell[solid] & (types[picked] == FOOD) & ~inside
+        local, picked, solid = local[~passes], picked[~passes], solid[~passes]
+
+        touching, normalX, normalY, penetration = circleSquareContacts(
+            x[picked], y[picked], reach[local], dense.x[solid], dense.y[solid], dense.size[solid])
+        local, picked, solid = local[touching], picked[touching], solid[touching]
+        normalX, normalY, penetration = normalX[touching], normalY[touching], penetration[touching]
+
+        # Apply impulse
+        impulse = 2.0  # Bounce factor
+        dot_product = velx[picked] * normalX + vely[picked] * normalY
+        velx[picked] -= impulse * dot_product * normalX
+        vely[picked] -= impulse * dot_product * normalY
+
+        # Move particle out of membrane
+        x[picked] += normalX * penetration
+        y[picked] += normalY * penetration
+
+        # Damage wall
+        hitSolids.append(solid)
+
+        # UGMs that touch a cell inject their genes into it and are used up
+        infecting = (types[picked] == UGM) & dense.isCell[solid]
+        consumed[local[infecting]] = True
+        infections.append(np.stack([np.full(np.count_nonzero(infecting), round), picked[infecting], solid[infecting]], axis=1))
+
+    hitSolids, hits = np.unique(np.concatenate(hitSolids), return_counts=True) if hitSolids else (np.zeros(0, dtype=np.int64),) * 2
+    infections = np.concatenate(infections) if infections else np.zeros((0, 3), dtype=np.int64)
+    return hitSolids, hits, infections
+
+class ContainmentRegistry:
+    # Keeps each Cell's set of contained particles live. A particle is only
+    # re-checked when it crosses into a different 20px bucket, and listeners
+    # on onEnter/onExit get called with (cell, particle) as it moves. The
+    # store's inside column mirrors particle.container as a cell handle, so
+    # containmentChanges can tell which particles changed cell without
+    # visiting them.
+    def __init__(self, grid):
+        self.grid = grid
+        self.onEnter = []
+        self.onExit = []
+
+    def containerAt(self, key):
+        for cell in self.grid.buckets.get(key, ()):
+            if isinstance(cell, Cell):
+                return cell
+        return None
+
+    def track(self, particle):
+        particle.bucket = self.grid.bucketOf(particle.x, particle.y)
+        self._enter(particle, self.containerAt(particle.bucket))
+
+    def untrack(self, particle):
+        self._exit(particle)
+
+    def applyChanges(self, store, dense, rows, solids):
+        # The object half of containmentChanges: move each of rows
+        # (ascending) into the cell dense.solids[solid], or out of any for -1
+        for row, solid in zip(rows.tolist(), solids.tolist()):
+            particle = store.proxies[row]
+            self._exit(particle)
+            if solid >= 0:
+                self._enter(particle, dense.solids[solid])
+
+    def evict(self, cell):
+        for particle in list(cell.contents):
+            self._exit(particle)
+
+    def _enter(self, particle, cell):
+        if cell is None:
+            return
+        particle.container = cell
+        particle.store.inside[particle.row] = cell.handle
+        cell.contents[particle] = None
+        for callback in self.onEnter:
+            callback(cell, particle)
+
+    def _exit(self, particle):
+        cell = particle.container
+        if cell is None:
+            return
+        particle.container = None
+        if particle.row >= 0:
+            particle.store.inside[particle.row] = -1
+        cell.contents.pop(particle, None)
+        for callback in self.onExit:
+            callback(cell, particle)
+
+def containmentChanges(store, dense, rows):
+    # The array half of the containment pass, for the given live rows
+    # (ascending) of store: the ones that crossed into another bucket get it
+    # written to bx/by, and those whose cell changed come back with the
+    # solid holding them now (-1 for none). Only the rows' own columns are
+    # written, so it can be done a strip at a time like membraneContacts.
+    bx = (store.x[rows] // cell_size).astype(np.int32)
+    by = (store.y[rows] // cell_size).astype(np.int32)
+    crossed = np.flatnonzero((bx != store.bx[rows]) | (by != store.by[rows]))
+    rows, bx, by = rows[crossed], bx[crossed], by[crossed]
+    store.bx[rows] = bx
+    store.by[rows] = by
+    solid = dense.at(bx.astype(np.int64), by.astype(np.int64))
+    held = np.flatnonzero(solid >= 0)
+    solid[held[~dense.isCell[solid[held]]]] = -1  # Walls hold nothing
+    held = solid >= 0
+    container = np.full(len(rows), -1, dtype=np.int64)
+    container[held] = dense.handle[solid[held]]
+    changed = np.flatnonzero(container != store.inside[rows])
+    return rows[changed], solid[changed]
+
+def hashRoll(sides, *keys):
+    # A roll in range(sides) that depends only on the integer keys (splitmix64
+    # style mixing). Used where the result mustn't depend on the order things
+    # happen in, such as genes caught up after a chunk wakes.
+    mask = (1 << 64) - 1
+    x = 0
+    for key in keys:
+        x = (x ^ key) * 0x9E3779B97F4A7C15 & mask
+        x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & mask
+        x = (x ^ (x >> 27)) * 0x94D049BB133111EB & mask
+        x ^= x >> 31
+    return x % sides
+
+class Cell:
+    def __init__(self, x, y, genes=defaultGenome):
+        self.population = None  # The world's Population while the cell is in a world
+        self.x = x
+        self.y = y
+        self.size = 20
+        self.membraneHealth = 120
+        self.genome = genes.copy() if isinstance(genes, Genome) else Genome(genes)
+        self.memory = None  # Gene stored by a 'remember' gene
+        self.doIn = True
+        self.onGeneNumber = 0
+        self.geneBrightness = 0
+        self.energy = 100
+        self.myTick = 0
+        self.contents = {}  # Particles inside this cell, kept by the world's ContainmentRegistry
+        self.handle = -1
+        self.alive = True
+
+    def update(self, world):
+        if self.membraneHealth < 1:
+            world.removeCell(self)
+            for _ in range(10):
+                world.spawnParticle(self.x, self.y, 'waste', 2)
+
+        if self.myTick != math.floor(world.tick) and self.genome:
+            self.myTick = math.floor(world.tick)
+            self.executeGene(world, math.floor(world.tick) % len(self.genome))
+
+    # membraneHealth and energy keep the world's Population totals up to date
+    @property
+    def membraneHealth(self):
+        return self._membraneHealth
+
+    @membraneHealth.setter
+    def membraneHealth(self, value):
+        if self.population:
+            self.population.membraneHealth += value - self._membraneHealth
+        self._membraneHealth = value
+
+    @property
+    def energy(self):
+        return self._energy
+
+    @energy.setter
+    def energy(self, value):
+        if self.population:
+            self.population.energy += value - self._energy
+        self._energy = value
+
+    @property
+    def genes(self):
+        # Read-only view; change genes through the Genome or setGenes
+        return self.genome.genes
+
+    @property
+    def geneHealth(self):
+        return self.genome.health
+
+    def executeGene(self, world, index):
+        try:
+            gene = self.genes[index]
+        except:
+            return
+
+        self.energy -= 3
+        self.genome.damage(index, 1 + hashRoll(4, world.seed, self.handle, self.myTick))
+
+        geneA, geneB = gene.action, gene.target
+
+        if geneA == 1:
+            if geneB == 1 and not self.doIn:
+                foodParts = self.getInternalParticles(world, 'food')
+                if foodParts:
+                    for food in foodParts:
+                        self.fireLaser(world, food.x, food.y)
+                        world.despawn(food)
+                        self.energy += 10
+                        world.spawnParticle(self.x, self.y, 'waste', 2)
+            elif geneB == 3 and not self.doIn:
+                self.membraneHealth = 0
+                self.fireLaser(world, self.x - 20, self.y - 20)
+                self.fireLaser(world, self.x + 20, self.y - 20)
+                self.fireLaser(world, self.x - 20, self.y + 20)
+                self.fireLaser(world, self.x + 20, self.y + 20)
+        elif geneA == 2:
+            if geneB == 3 and not self.doIn:
+                self.membraneHealth = 0
+                self.fireLaser(world, self.x - 20, self.y - 20)
+                self.fireLaser(world, self.x + 20, self.y - 20)
+                self.fireLaser(world, self.x - 20, self.y + 20)
+                self.fireLaser(world, self.x + 20, self.y + 20)
+            elif geneB == 2 and self.doIn:
+                wasteParts = self.getInternalParticles(world, 'waste')
+                if wasteParts:
+                    # Weight particles by inverse distance - closer particles more likely
+                    weights = []
+                    for waste in wasteParts:
+                        distance = math.sqrt((waste.x - self.x)**2 + (waste.y - self.y)**2)
+                        weights.append(1.0 / (distance + 1))  # Add 1 to avoid division by zero
+                    waste = world.random.choices(wasteParts, weights=weights, k=1)[0]
+                    self.fireLaser(world, waste.x, waste.y)
+                    world.despawn(waste)
+            elif geneB == 1 and self.doIn:
+                foodParts = self.getInternalParticles(world, 'food')
+                if foodParts:
+                    food = world.random.choice(foodParts)
+                    self.fireLaser(world, food.x, food.y)
+                    world.despawn(food)
+                    world.spawnParticle(self.x, self.y, 'waste', 2)
+        elif geneA == 3:
+            if geneB == 3 and not self.doIn:
+                self.membraneHealth += 25
+                if self.membraneHealth > 120:
+                    self.membraneHealth = 120
+        elif geneA in [4, 5, 7]:
+            self.processADNA(world, geneA, gene)
+        elif geneA == 6:
+            if geneB == 7:
+                self.doIn = True
+            elif geneB == 8:
+                self.doIn = False
+
+    def processADNA(self, world, geneA, gene):
+        # format:
+        # 4/5(firstGene.lastGenne)
+        # 6a/b
+
+        target_positions = []
+
+        # ADNA nono's:
+        if geneA in [3,6]:
+            print("Invalid geneA:", geneA)
+            return
+
+        # Select target genes
+        if gene.target in [4, 5] and gene.arg:
+            startGene, endGene = gene.arg
+
+            # Position ends (DNA.txt's RDNA[-1 to 3]) are never in the
+            # genome, so like before they don't select anything yet
+            start = self.genome.indexOf(startGene)
+            end = self.genome.indexOf(endGene)
+            if start is not None and end is not None:
+                target_positions = list(range(start, end))
+
+        elif gene.target == 6:
+            if gene.arg == 'a':
+                target_positions = [self.genome.weakest()]
+            elif gene.arg == 'b':
+                target_positions = [self.genome.strongest()]
+
+        # Apply effects to target genes (removals go back to front so they don't shift the rest)
+        if geneA in [1, 2]:
+            target_positions.reverse()
+        for position in target_positions:
+            if geneA in [1, 2]:
+                if geneA == 1:
+                    self.energy += 3
+                self.genome.remove(position)
+                world.spawnParticle(self.x, self.y, 'waste', 2)
+            elif geneA == 4:
+                self.memory = self.genome[position]
+            elif geneA == 5 and self.memory is not None:
+                self.genome.replace(position, self.memory)
+
+    def setGenes(self, genes):
+        # Editors hand over a freshly compiled genome; health restarts for
+        # genes that didn't exist before
+        health = self.genome.health[:len(genes)] + [100] * (len(genes) - len(self.genome))
+        self.genome = Genome(genes, health)
+
+    def inject(self, genes):
+        # Genetic material from a UGM is spliced onto the front of the genome
+        self.genome.insert(0, genes)
+
+    def fireLaser(self, world, x, y):
+        # Lasers are purely visual, the world only records that one was fired
+        world.laserEvents.append((self.x, self.y, x, y))
+
+    def getInternalParticles(self, world, typeFilter=None):
+        # self.contents only holds what is inside this cell, so there's no
+        # need to look at the rest of the world
+        if typeFilter is None:
+            return list(self.contents)
+        return [particle for particle in self.contents if particle.type == typeFilter]
+
+class Wall:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.size = 20
+        self.membraneHealth = 0
+        self.handle = -1
+        self.alive = True
+
+    def update(self, world):
+        pass
+
+chunk_size = 8  # Chunk side in grid buckets (160px)
+
+PARTICLE_TYPES = ("food", "waste", "ugm")
+FOOD, WASTE, UGM = range(len(PARTICLE_TYPES))
+particle_speed = 2  # Reduced speed for more controlled movement
+NO_BUCKET = np.iinfo(np.int32).min
+
+class ParticleStore:
+    # Structure-of-arrays backing for every particle in the world. Row i of
+    # each column belongs to proxies[i]. Each particle also gets an integer
+    # handle that never changes or gets reused, rowOf maps it to its current
+    # row. During a step removals only tombstone their row and spawns are
+    # queued; flush() applies both in one go at the end of the step.
+    #
+    # Columns are made by self.allocate(capacity, dtype), np.zeros unless
+    # they've been moved somewhere else with reallocate() (shared memory,
+    # see cellParallel).
+    columns = ("x", "y", "px", "py", "velx", "vely", "type", "radius", "bx", "by", "inside", "handle", "alive")
+
+    def __init__(self, capacity=1024):
+        self.allocate = np.zeros
+        self.count = 0
+        self.counts = [0] * len(PARTICLE_TYPES)  # Live rows of each type
+        self.proxies = []
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.px = np.zeros(capacity)  # Position at the start of the last step, for drawing between steps
+        self.py = np.zeros(capacity)
+        self.velx = np.zeros(capacity)
+        self.vely = np.zeros(capacity)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.radius = np.zeros(capacity)
+        self.bx = np.full(capacity, NO_BUCKET, dtype=np.int32)  # Last 20px bucket seen by the ContainmentRegistry
+        self.by = np.full(capacity, NO_BUCKET, dtype=np.int32)
+        self.inside = np.full(capacity, -1, dtype=np.int64)  # Handle of the Cell the particle is in, -1 if none
+        self.handle = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)  # False marks a tombstone waiting for flush()
+        self.rowOf = np.full(capacity, -1, dtype=np.int64)  # handle -> row, -1 once removed
+        self.nextHandle = 0
+        self._pending = []  # (proxy, x, y, velx, vely, type, radius) to append on flush()
+        self._tombstones = 0
+
+    def _grow(self, needed):
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.columns:
+            old = getattr(self, name)
+            new = self.allocate(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def reallocate(self, allocate):
+        # Move every column into arrays made by allocate from now on
+        self.allocate = allocate
+        for name in self.columns:
+            old = getattr(self, name)
+            new = allocate(len(old), dtype=old.dtype)
+            new[:] = old
+            setattr(self, name, new)
+
+    def _growHandles(self, needed):
+        capacity = len(self.rowOf)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        rowOf = np.full(capacity, -1, dtype=np.int64)
+        rowOf[:len(self.rowOf)] = self.rowOf
+        self.rowOf = rowOf
+
+    def add(self, proxy, x, y, velx, vely, type, radius):
+        # The particle gets its handle straight away but only takes up a row,
+        # and shows up in proxies, once flush() runs
+        proxy.store = self
+        proxy.handle = self.nextHandle
+        self.nextHandle += 1
+        self._pending.append((proxy, x, y, velx, vely, type, radius))
+        return proxy
+
+    def remove(self, proxy):
+        if proxy.row < 0:
+            self._pending = [entry for entry in self._pending if entry[0] is not proxy]
+            return
+        if self.alive[proxy.row]:
+            self.alive[proxy.row] = False
+            self.counts[self.type[proxy.row]] -= 1
+            self._tombstones += 1
+
+    def get(self, handle):
+        # Proxy for a handle, or None while it's still waiting for flush()
+        # (rowOf only grows then) or once that particle is gone
+        if handle >= len(self.rowOf):
+            return None
+        row = self.rowOf[handle]
+        return self.proxies[row] if row >= 0 else None
+
+    def flush(self):
+        # Compact away the tombstones, then append everything spawned since
+        # the last flush. Returns the newly added proxies.
+        if self._tombstones:
+            self._compact()
+        if not self._pending:
+            return []
+
+        pending, self._pending = self._pending, []
+        start = self.count
+        end = start + len(pending)
+        self._grow(end)
+        self._growHandles(self.nextHandle)
+        proxies, x, y, velx, vely, types, radius = zip(*pending)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.px[start:end] = x
+        self.py[start:end] = y
+        self.velx[start:end] = velx
+        self.vely[start:end] = vely
+        self.type[start:end] = types
+        self.radius[start:end] = radius
+        self.bx[start:end] = NO_BUCKET
+        self.by[start:end] = NO_BUCKET
+        self.inside[start:end] = -1
+        self.handle[start:end] = [proxy.handle for proxy in proxies]
+        self.alive[start:end] = True
+        self.rowOf[self.handle[start:end]] = np.arange(start, end)
+        for row, proxy in enumerate(proxies, start):
+            proxy.row = row
+        self.proxies.extend(proxies)
+        self.count = end
+        for kind in types:
+            self.counts[kind] += 1
+        return proxies
+
+    def retype(self, rows, kind):
+        # Turn the given rows into particles of another type
+        rows = np.asarray(rows, dtype=np.int64)
+        for old in self.type[rows][self.alive[rows]].tolist():
+            self.counts[old] -= 1
+            self.counts[kind] += 1
+        self.type[rows] = kind
+
+    def recount(self):
+        # For when the columns have been filled in directly (checkpoints)
+        n = self.count
+        self.counts = np.bincount(self.type[:n][self.alive[:n]], minlength=len(PARTICLE_TYPES)).tolist()
+
+    def _compact(self):
+        # Fill each hole below the new end with a live row from above it, so
+        # the work is proportional to the number of removals
+        n = self.count
+        dead = np.flatnonzero(~self.alive[:n])
+        newCount = n - len(dead)
+        holes = dead[dead < newCount]
+        movers = np.flatnonzero(self.alive[newCount:n]) + newCount
+
+        for row in dead:
+            self.proxies[row].row = -1
+        self.rowOf[self.handle[dead]] = -1
+        for name in self.columns:
+            column = getattr(self, name)
+            column[holes] = column[movers]
+        self.rowOf[self.handle[holes]] = holes
+        for hole, mover in zip(holes.tolist(), movers.tolist()):
+            proxy = self.proxies[mover]
+            proxy.row = hole
+            self.proxies[hole] = proxy
+        del self.proxies[newCount:]
+        self.count = newCount
+        self._tombstones = 0
+
+    def integrate(self, width, height, rng, friction=friction):
+        # Same steps as the old per-particle update, applied to every row at once
+        n = self.count
+        noiseX = rng.uniform(-0.02, 0.02, n)
+        noiseY = rng.uniform(-0.02, 0.02, n)
+        integrateParticles(self.x[:n], self.y[:n], self.velx[:n], self.vely[:n], self.radius[:n],
+                           width, height, friction, noiseX, noiseY)
+
+def integrateParticles(x, y, velx, vely, radius, width, height, friction, noiseX, noiseY):
+    # Moves the particles in place. noiseX/noiseY are each particle's random
+    # nudge, drawn up front so any slice of the rows can be moved on its own.
+    # Apply friction
+    velx *= friction
+    vely *= friction
+
+    # Update position
+    x += velx * particle_speed
+    y += vely * particle_speed
+
+    # Wrap around screen edges with smoother transition
+    low = x < -radius
+    high = x > width + radius
+    x[low] = width + radius[low]
+    x[high] = -radius[high]
+    low = y < -radius
+    high = y > height + radius
+    y[low] = height + radius[low]
+    y[high] = -radius[high]
+
+    velx += noiseX
+    vely += noiseY
+
+    # Normalize velocity to maintain consistent speed
+    magnitude = np.hypot(velx, vely)
+    moving = magnitude > 0
+    velx[moving] /= magnitude[moving]
+    vely[moving] /= magnitude[moving]
+
+    # Apply subtle dampening
+    velx *= 0.3
+    vely *= 0.3
+
+def _column(name):
+    def get(self):
+        row = self._live()
+        return getattr(self.store, name)[row].item()
+
+    def set(self, value):
+        row = self._live()
+        getattr(self.store, name)[row] = value
+
+    return property(get, set)
+
+class Particle:
+    # Handle onto one row of the world's ParticleStore. Create these through
+    # World.spawnParticle rather than directly.
+    __slots__ = ("store", "row", "handle", "container")
+
+    x = _column("x")
+    y = _column("y")
+    velx = _column("velx")
+    vely = _column("vely")
+    radius = _column("radius")
+
+    def __init__(self):
+        self.store = None
+        self.row = -1
+        self.handle = -1
+        self.container = None  # Cell this particle is inside, if any
+
+    def _live(self):
+        # Row -1 would quietly read and write the store's last row
+        if self.row < 0:
+            raise RuntimeError("Particle is not in a world (never spawned, or already removed)")
+        return self.row
+
+    @property
+    def type(self):
+        row = self._live()
+        return PARTICLE_TYPES[self.store.type[row]]
+
+    @type.setter
+    def type(self, value):
+        row = self._live()
+        self.store.retype([row], PARTICLE_TYPES.index(value))
+
+    @property
+    def bucket(self):
+        row = self._live()
+        return (self.store.bx[row].item(), self.store.by[row].item())
+
+    @bucket.setter
+    def bucket(self, key):
+        row = self._live()
+        self.store.bx[row], self.store.by[row] = key
+
+class UnboundGeneticMaterial(Particle):
+    __slots__ = ("genes", "color", "creation_time", "half_life")
+
+    def __init__(self, genes, creation_time=0):
+        super().__init__()
+        self.genes = genes
+        self.color = (150, 50, 150)  # Purple color for genetic material
+        self.creation_time = creation_time  # World time in milliseconds
+        self.half_life = 15000  # 15 seconds in milliseconds
+
+    def decays(self, world):
+        # Check for decay based on half-life
+        time_alive = world.timeMs - self.creation_time
+
+        # Random chance to decay based on half-life
+        if time_alive > self.half_life:
+            decay_chance = world.random.random()
+            if decay_chance < 0.1:  # 10% chance per update after half-life
+                # Create waste particle at current position
+                world.spawnParticle(self.x, self.y, "waste", 2)
+                return True  # Signal that this genetic material should be removed
+        return False
+
+Census = namedtuple("Census", ["food", "waste", "ugm", "cells", "energy", "membraneHealth"])
+
+class Population:
+    # Running totals for the HUD and analytics, so nothing has to scan the
+    # world to count it. Live particles of each type are counted by the
+    # ParticleStore (store.counts) as rows come, go and change type; the
+    # living cells and their total energy and membrane health are kept here
+    # by World.addCell/removeCell and the Cell setters.
+    def __init__(self, world):
+        self.world = world
+        self.cells = 0
+        self.energy = 0
+        self.membraneHealth = 0
+
+    def addCell(self, cell):
+        cell.population = self
+        self.cells += 1
+        self.energy += cell.energy
+        self.membraneHealth += cell.membraneHealth
+
+    def removeCell(self, cell):
+        cell.population = None
+        self.cells -= 1
+        self.energy -= cell.energy
+        self.membraneHealth -= cell.membraneHealth
+
+    @property
+    def food(self):
+        return self.world.store.counts[FOOD]
+
+    @property
+    def waste(self):
+        return self.world.store.counts[WASTE]
+
+    @property
+    def ugm(self):
+        return self.world.store.counts[UGM]
+
+    @property
+    def foodWasteRatio(self):
+        # No waste at all counts as one, so the ratio is just the food
+        return self.food / max(self.waste, 1)
+
+    @property
+    def meanEnergy(self):
+        return self.energy / self.cells if self.cells else 0
+
+    @property
+    def meanMembraneHealth(self):
+        return self.membraneHealth / self.cells if self.cells else 0
+
+    def census(self):
+        counts = self.world.store.counts
+        return Census(counts[FOOD], counts[WASTE], counts[UGM], self.cells, self.energy, self.membraneHealth)
+
+class World:
+    # genes is the genome every cell starts with, foodShare the fraction of
+    # seeded particles that are food. friction and damping default to the
+    # module settings (damping isn't applied anywhere yet).
+    #
+    # All randomness comes from self.random and self.npRandom, both seeded
+    # from self.seed (picked at random if not given), and time only moves in
+    # step(). Inputs from outside go through step(), editGenes() and
+    # placeUGM(), which report to self.recorder when one is attached, so a
+    # recorded run can be replayed exactly.
+    #
+    # populate=False leaves the world empty, for filling in from a checkpoint.
+    #
+    # Cells are grouped into chunks of chunk_size x chunk_size buckets. With
+    # sleep on, a chunk with no particles in or next to it and no cell that
+    # could destroy itself stops updating; when something comes near (or an
+    # edit touches it) it wakes and replays the gene ticks it missed before
+    # carrying on. Genes in an empty cell don't touch anything outside it and
+    # their damage rolls come from hashRoll, so sleeping never changes the
+    # outcome, it only skips the per-step work. Sleeping cells (and so the
+    # Population totals) lag behind until then: call catchUp() between steps
+    # before reading either.
+    def __init__(self, spongeSize=3**3, particleCount=500, seed=None, genes=defaultGenome, foodShare=0.5, friction=friction, damping=damping, populate=True, sleep=True):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.npRandom = np.random.default_rng(seed)
+        self.recorder = None
+        self.profiler = None  # A cellProfile.Profiler to time the phases of step() with
+        self.workers = None  # A cellParallel.ParticleWorkers to move the particles on other processes
+        self.spongeSize = spongeSize
+        self.particleCount = particleCount
+        self.genes = genes
+        self.foodShare = foodShare
+        self.friction = friction
+        self.damping = damping
+        self.width = world_width
+        self.height = world_height
+        self.tick = 0
+        self.timeMs = 0  # Stands in for pygame.time.get_ticks() (UGM half-life)
+        self.cells = []
+        self.deadCells = 0  # Tombstoned entries in self.cells, dropped at the end of the step
+        self._deadChunks = set()  # Chunks holding any of them
+        self.nextCellHandle = 0
+        self.chunks = {}  # Chunk key -> its Cells, in self.cells order
+        self.chunkOrder = []  # (cy, cx) of every chunk, sorted so cells update row by row
+        self.sleeping = set()  # Keys of chunks that are asleep
+        self.sleep = sleep
+        self.geneTicks = [0]  # Every whole tick the world has passed, for catching sleepers up
+        self._unrunTick = None  # Whole tick this step's cell updates haven't run yet
+        self._caughtUp = 0  # len(geneTicks) at the last catchUp()
+        self.grid = SpatialGrid()
+        self.containment = ContainmentRegistry(self.grid)
+        self.containment.onEnter.append(self._foodDamagesMembrane)
+        self.store = ParticleStore()
+        self.population = Population(self)
+        self.laserEvents = []  # (x, y, targetX, targetY) fired during the last step
+        self.foodWasteRatio = 1.0
+        if not populate:
+            return
+
+        layout = spongeLayout(spongeSize)
+        self.width = max(world_width, layout.shape[1] * cell_size)
+        self.height = max(world_height, layout.shape[0] * cell_size)
+        template = Genome(self.genes)  # Every cell starts with a copy of this
+        ys, xs = np.nonzero(layout)
+        for x, y, kind in zip(xs.tolist(), ys.tolist(), layout[ys, xs].tolist()):
+            if kind == WALL:
+                self.addCell(Wall(x * 20, y * 20))
+            else:
+                self.addCell(Cell(x * 20, y * 20, template))
+
+        self._seedParticles(particleCount)
+        self.flush()
+
+    @property
+    def particles(self):
+        return self.store.proxies
+
+    def _seedParticles(self, count):
+        # Scatter food and waste over the open space. A point on a cell's edge
+        # counts as inside it, so points on a bucket line also test the
+        # bucket to their left/above.
+        rng = self.npRandom
+        columns = self.width // cell_size + 2
+        rows = self.height // cell_size + 2
+        occupied = np.zeros((rows, columns), dtype=bool)
+        for gx, gy in self.grid.buckets:
+            if 0 <= gx < columns and 0 <= gy < rows:
+                occupied[gy, gx] = True
+
+        placed = 0
+        while placed < count:
+            needed = count - placed
+            x = rng.integers(0, self.width + 1, needed)
+            y = rng.integers(0, self.height + 1, needed)
+            types = np.where(rng.random(needed) > 1 - self.foodShare, FOOD, WASTE)
+
+            gx0, gy0 = x // cell_size, y // cell_size
+            gx1 = np.maximum(np.where(x % cell_size == 0, gx0 - 1, gx0), 0)
+            gy1 = np.maximum(np.where(y % cell_size == 0, gy0 - 1, gy0), 0)
+            in_cell = occupied[gy0, gx0] | occupied[gy0, gx1] | occupied[gy1, gx0] | occupied[gy1, gx1]
+
+            for px, py, kind in zip(x[~in_cell], y[~in_cell], types[~in_cell]):
+                self.spawnParticle(float(px), float(py), PARTICLE_TYPES[kind], 2)
+                placed += 1
+
+    def addCell(self, cell):
+        if cell.handle < 0:
+            cell.handle = self.nextCellHandle
+            self.nextCellHandle += 1
+        self.cells.append(cell)
+        self.grid.insert(cell)
+        if isinstance(cell, Cell):
+            key = self.chunkOf(cell)
+            if key not in self.chunks:
+                self.chunks[key] = []
+                insort(self.chunkOrder, (key[1], key[0]))
+            self.chunks[key].append(cell)
+            if cell.alive:
+                self.population.addCell(cell)
+        return cell
+
+    def chunkOf(self, cell):
+        span = cell_size * chunk_size
+        return (int(cell.x // span), int(cell.y // span))
+
+    def wakeCell(self, cell):
+        key = self.chunkOf(cell)
+        if key in self.sleeping:
+            self.wakeChunk(key)
+
+    def wakeChunk(self, key):
+        self.sleeping.discard(key)
+        self._replayChunk(key)
+
+    def _replayChunk(self, key):
+        for cell in self.chunks.get(key, ()):
+            # Run each whole tick the cell slept through, except one the
+            # cells are about to run in this step's update
+            start = bisect_right(self.geneTicks, cell.myTick)
+            for geneTick in self.geneTicks[start:]:
+                if geneTick == self._unrunTick or not cell.genome:
+                    break
+                cell.myTick = geneTick
+                cell.executeGene(self, geneTick % len(cell.genome))
+
+    def wakeAll(self):
+        for key in list(self.sleeping):
+            self.wakeChunk(key)
+
+    def catchUp(self):
+        # Run the gene ticks the sleeping chunks have missed without waking
+        # them, so their cells and the Population totals read the same as if
+        # they'd never slept. Nothing to do until another whole tick passes.
+        if self._caughtUp == len(self.geneTicks):
+            return
+        self._caughtUp = len(self.geneTicks)
+        for key in self.sleeping:
+            self._replayChunk(key)
+
+    def _canSleep(self, cell):
+        if cell.membraneHealth < 1:
+            return False
+        genes = cell.genes + [cell.memory] if cell.memory is not None else cell.genes
+        return not any(gene.action in (1, 2) and gene.target == 3 for gene in genes)
+
+    def _chunksNearParticles(self):
+        # Chunks holding any bucket in the 3x3 around a live particle
+        store = self.store
+        n = store.count
+        live = store.alive[:n]
+        gx = (store.x[:n][live] // cell_size).astype(np.int64)
+        gy = (store.y[:n][live] // cell_size).astype(np.int64)
+        codes = []
+        for dx in (-1, 0, 1):
+            cx = (gx + dx) // chunk_size + 1024
+            for dy in (-1, 0, 1):
+                codes.append(cx * 4096 + (gy + dy) // chunk_size + 1024)
+        if not codes or not len(codes[0]):
+            return set()
+        return {(code // 4096 - 1024, code % 4096 - 1024) for code in np.unique(np.concatenate(codes)).tolist()}
+
+    def _updateSleep(self, newGeneTick):
+        # Chunks only nod off on a new whole tick, before their cells run it,
+        # so there's nothing to check on other steps unless some are asleep
+        if not (newGeneTick or self.sleeping):
+            return
+        near = self._chunksNearParticles()
+        for key in self.sleeping & near:
+            self.wakeChunk(key)
+        if newGeneTick:
+            for key, cells in self.chunks.items():
+                if key not in near and key not in self.sleeping and all(self._canSleep(cell) for cell in cells):
+                    self.sleeping.add(key)
+
+    def _foodDamagesMembrane(self, cell, particle):
+        # Food pushing its way into a cell wears the membrane down once
+        if particle.type == "food":
+            cell.membraneHealth -= 1
+
+    def _randomHeading(self):
+        velx, vely = self.npRandom.random(2) * 2 - 1
+        magnitude = math.sqrt(velx**2 + vely**2) or 1
+        return velx / magnitude, vely / magnitude
+
+    # Spawned particles join the world at the next flush (the end of the
+    # current step, or the start of the next one for spawns made between
+    # steps). Until then the returned particle only has its handle.
+    def spawnParticle(self, x, y, type, radius):
+        velx, vely = self._randomHeading()
+        return self.store.add(Particle(), x, y, velx, vely, PARTICLE_TYPES.index(type), radius)
+
+    def spawnUGM(self, x, y, velx, vely, genes):
+        if not (velx or vely):
+            velx, vely = self._randomHeading()
+        return self.store.add(UnboundGeneticMaterial(genes, self.timeMs), x, y, velx, vely, UGM, 3)
+
+    def placeUGM(self, x, y, velx, vely, genes):
+        # A UGM placed by the user rather than by the simulation
+        if self.recorder:
+            self.recorder.record("ugm", x, y, velx, vely, [gene.text for gene in genes])
+        return self.spawnUGM(x, y, velx, vely, genes)
+
+    def editGenes(self, cell, genes):
+        if self.recorder:
+            self.recorder.record("edit", cell.handle, [gene.text for gene in genes])
+        self.wakeCell(cell)
+        cell.setGenes(genes)
+
+    def cellByHandle(self, handle):
+        for cell in self.cells:
+            if cell.handle == handle:
+                return cell
+        return None
+
+    def despawn(self, particle):
+        # Leaves its cell straight away, the row is reclaimed on the next flush
+        self.containment.untrack(particle)
+        self.store.remove(particle)
+
+    def removeCell(self, cell):
+        if not cell.alive:
+            return
+        cell.alive = False
+        self.deadCells += 1
+        self.grid.remove(cell)
+        if isinstance(cell, Cell):
+            self._deadChunks.add(self.chunkOf(cell))
+            self.population.removeCell(cell)
+        self.containment.evict(cell)
+
+    def flush(self):
+        # Apply the removals and spawns queued up since the last flush
+        if self.deadCells:
+            self.cells = [cell for cell in self.cells if cell.alive]
+            for key in self._deadChunks:
+                self.chunks[key] = [cell for cell in self.chunks[key] if cell.alive]
+            self.deadCells = 0
+            self._deadChunks.clear()
+        for particle in self.store.flush():
+            self.containment.track(particle)
+
+    def _updateContainment(self, changes=None):
+        # Only particles that moved into another cell need the registry.
+        # changes is what containmentChanges found, if the workers already
+        # ran it; rows tombstoned since are left out.
+        store = self.store
+        dense = self.grid.dense()
+        if changes is None:
+            changes = containmentChanges(store, dense, np.flatnonzero(store.alive[:store.count]))
+        rows, solids = changes
+        live = store.alive[rows]
+        self.containment.applyChanges(store, dense, rows[live], solids[live])
+
+    def step(self, dt):
+        if self.recorder:
+            self.recorder.record("step", dt)
+        self.tick += dt
+        self.timeMs += dt * 1000
+        self.laserEvents = []
+        self.flush()
+        # Where each particle starts this step, so it can be drawn part way through
+        n = self.store.count
+        self.store.px[:n] = self.store.x[:n]
+        self.store.py[:n] = self.store.y[:n]
+
+        newGeneTick = math.floor(self.tick) != self.geneTicks[-1]
+        if newGeneTick:
+            self.geneTicks.append(math.floor(self.tick))
+        self._unrunTick = math.floor(self.tick)
+        if self.sleep:
+            self._updateSleep(newGeneTick)
+
+        # Cells update chunk by chunk, whether or not any are asleep, so the
+        # shared random draws happen in the same order either way. Cells that
+        # die here are only tombstoned by removeCell and leave the chunk
+        # lists in the flush at the end of the step, so the lists can be
+        # walked as is.
+        for cy, cx in self.chunkOrder:
+            key = (cx, cy)
+            if key not in self.sleeping:
+                for cell in self.chunks[key]:
+                    if cell.alive:
+                        cell.update(self)
+        self._unrunTick = None
+        profiler = self.profiler
+        if profiler:
+            profiler.mark("cells")
+
+        if self.workers:
+            injected, changes = self.workers.moveParticles(self)
+        else:
+            injected = resolveMembraneCollisions(self)
+            self.store.integrate(self.width, self.height, self.npRandom, self.friction)
+            changes = None
+        for ugm in injected:
+            self.despawn(ugm)
+        self._updateContainment(changes)
+
+        n = self.store.count
+        alive = self.store.alive[:n]
+        if self.store.counts[UGM]:
+            ugmRows = np.flatnonzero((self.store.type[:n] == UGM) & alive)
+            for ugm in [self.store.proxies[row] for row in ugmRows]:
+                if ugm.decays(self):
+                    self.despawn(ugm)
+        if profiler:
+            profiler.mark("particles")
+
+        self.foodWasteRatio = self.population.foodWasteRatio
+
+        # Use the foodwaste ratio to determine how much waste to transmute to food
+        if self.foodWasteRatio < 0.5:  # If there's too much waste compared to food
+            conversion_chance = 0.3 * (1 - self.foodWasteRatio/0.5)  # More conversion chance when ratio is lower
+            candidates = np.flatnonzero((self.store.type[:n] == WASTE) & alive)[:10]  # Convert up to 10 waste particles at a time
+            converted = candidates[self.npRandom.random(len(candidates)) < conversion_chance]  # Weighted chance based on ratio
+            self.store.retype(converted, FOOD)
+
+        self.flush()
+        if profiler:
+            profiler.mark("transmutation")
+
+def runHeadless(steps, seed=None, dt=1/60, spongeSize=3**3, particleCount=500, world=None, afterStep=None):
+    # Pass world to run one that's already set up (e.g. with a recorder
+    # attached or restored from a checkpoint). afterStep(world) is called
+    # after every step.
+    if world is None:
+        world = World(spongeSize, particleCount, seed)
+    start = time.perf_counter()
+    for _ in range(steps):
+        world.step(dt)
+        if afterStep:
+            afterStep(world)
+    printStats(world, steps, time.perf_counter() - start)
+    return world
+
+def printStats(world, steps, elapsed):
+    world.catchUp()
+    print(f"Steps: {steps}  Tick: {world.tick:.2f}  Elapsed: {elapsed:.2f}s  ({steps / max(elapsed, 1e-9):.0f} steps/s)")
+    print(f"Cells: {world.population.cells}  Particles: {len(world.particles)}  Food/Waste: {world.foodWasteRatio:.2f}")
@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from cellWorld import World, Cell, compileGenome
+
+# Batch experiments: expand a grid of World settings, run every combination
+# headless in a process pool and stream one JSON line per run to a results
+# file. Runs already in the results file are skipped (unless they raised),
+# so an interrupted sweep picks up where it left off when started again.
+#
+# The grid is a JSON object; any key may be a single value or a list of values:
+#   {"genome": [["6;8", "3;3", "1;1"], ["6;7", "2;2"]],
+#    "particleCount": [500, 1000], "foodShare": 0.5, "friction": [0.98, 0.99],
+#    "depth": 3, "seed": [1, 2, 3]}
+# World's damping setting isn't applied by the integrator, so sweeping it is
+# refused rather than producing runs that only differ in their label.
+
+defaults = {
+    "genome": ['6;8', '3;3', '3;3', '1;1', '6;7', '2;2', '4;6a', '5;6a'],
+    "particleCount": 500,
+    "foodShare": 0.5,
+    "friction": 0.99,
+    "depth": 3,
+    "seed": 0,
+}
+
+def expandGrid(grid):
+    if "damping" in grid:
+        raise ValueError("damping can't be swept, the simulation doesn't apply it")
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+
+    axes = []
+    for name in sorted(defaults):
+        values = grid.get(name, defaults[name])
+        if values == []:
+            raise ValueError(f"No values given for sweep parameter {name}")
+        # A genome is itself a list, so only a list of lists sweeps it
+        single = not isinstance(values, list) or (name == "genome" and not isinstance(values[0], list))
+        axes.append([values] if single else values)
+
+    for combination in itertools.product(*axes):
+        yield dict(zip(sorted(defaults), combination))
+
+def runId(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+def sample(world):
+    world.catchUp()
+    population = world.population
+    return {
+        "tick": round(world.tick, 4),
+        "cells": population.cells,
+        "particles": len(world.particles),
+        "foodWasteRatio": world.foodWasteRatio,
+        "meanMembraneHealth": population.meanMembraneHealth,
+        "meanGenomeLength": sum(len(cell.genome) for cell in world.cells if isinstance(cell, Cell)) / population.cells if population.cells else 0,
+    }
+
+def runConfig(job):
+    # Runs in a worker process. The timeout is checked between steps, and a
+    # run that hits it still reports what it got through.
+    config, steps, dt, sampleEvery, timeout = job
+    record = {"id": runId(config), "config": config, "status": "ok"}
+    start = time.perf_counter()
+    series = []
+    step = 0
+    try:
+        world = World(3 ** config["depth"], config["particleCount"], config["seed"],
+                      genes=compileGenome(config["genome"]), foodShare=config["foodShare"],
+                      friction=config["friction"])
+        for step in range(1, steps + 1):
+            world.step(dt)
+            if step % sampleEvery == 0 or step == steps:
+                series.append(sample(world))
+            if timeout and time.perf_counter() - start > timeout:
+                record["status"] = "timeout"
+                series.append(sample(world))
+                break
+        record["steps"] = step
+        if series:
+            record["final"] = series[-1]
+    except Exception as error:
+        record["status"] = "error"
+        record["error"] = f"{type(error).__name__}: {error}"
+    record["series"] = series
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+    return record
+
+def finishedRuns(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as results:
+        for line in results:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short when the last sweep was killed
+            # Runs that raised are tried again
+            if "id" in record and record.get("status") != "error":
+                done.add(record["id"])
+    return done
+
+def runSweep(grid, out, steps=6000, dt=1/60, sampleEvery=600, timeout=None, workers=None):
+    if steps < 1 or sampleEvery < 1:
+        raise ValueError("steps and sampleEvery must be at least 1")
+    configs = list(expandGrid(grid))
+    done = finishedRuns(out)
+    jobs = [(config, steps, dt, sampleEvery, timeout) for config in configs if runId(config) not in done]
+    print(f"{len(configs)} runs in grid, {len(configs) - len(jobs)} already done, {len(jobs)} to go")
+    if not jobs:
+        return
+
+    with Pool(workers or os.cpu_count()) as pool, open(out, "a") as results:
+        for finished, record in enumerate(pool.imap_unordered(runConfig, jobs), 1):
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+            final = record.get("final", {})
+            print(f"[{finished}/{len(jobs)}] {record['id']} {record['status']} "
+                  f"cells={final.get('cells')} ratio={final.get('foodWasteRatio')} ({record['elapsed']}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of headless cell simulations")
+    parser.add_argument("grid", help="JSON file describing the parameter grid")
+    parser.add_argument("--out", default="sweep_results.jsonl", help="results file, one JSON line per run (appended to)")
+    parser.add_argument("--steps", type=int, default=6000, help="steps per run")
+    parser.add_argument("--dt", type=float, default=1/60, help="seconds of simulation time per step")
+    parser.add_argument("--sample-every", type=int, default=600, help="steps between recorded samples")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a run is cut short")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    if args.steps < 1:
+        parser.error("--steps must be at least 1")
+    if args.sample_every < 1:
+        parser.error("--sample-every must be at least 1")
+
+    with open(args.grid) as gridFile:
+        grid = json.load(gridFile)
+    try:
+        runSweep(grid, args.out, args.steps, args.dt, args.sample_every, args.timeout, args.workers)
+    except ValueError as error:
+        sys.exit(str(error))
+
+if __name__ == "__main__":
+    main()
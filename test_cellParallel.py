@@ -0,0 +1,32 @@
+import numpy as np
+
+from cellParallel import ParticleWorkers
+from cellWorld import World, Cell, compileGenome
+
+# The parallel particle pass has to end up exactly where the serial one does
+
+def runWorld(steps, workers=None):
+    world = World(3 ** 3, 600, seed=5)
+    world.workers = workers
+    genes = compileGenome(['1;3', '2;2'])
+    # UGMs well off every edge of the world, which the serial engine wraps
+    # back in on their next move
+    for x, y in [(-500, 100), (world.width + 400, 200), (150, -300), (-1e6, 1e6)]:
+        world.placeUGM(x, y, 0, 0, genes)
+    for _ in range(steps):
+        world.step(1/60)
+    return world
+
+def state(world):
+    n = world.store.count
+    columns = [getattr(world.store, name)[:n].copy() for name in ("x", "y", "velx", "vely", "type", "bx", "by", "inside")]
+    cells = [(cell.handle, cell.membraneHealth, [gene.text for gene in cell.genes], [particle.handle for particle in cell.contents])
+             for cell in world.cells if isinstance(cell, Cell)]
+    return columns, cells
+
+def test_matches_serial_with_particles_off_the_world():
+    serial = state(runWorld(30))
+    with ParticleWorkers(3, minParticles=0) as workers:
+        parallel = state(runWorld(30, workers))
+    assert all(np.array_equal(a, b) for a, b in zip(serial[0], parallel[0]))
+    assert serial[1] == parallel[1]
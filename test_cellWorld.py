@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from cellWorld import World, Cell, Wall, DenseGrid, compileGene, compileGenome
+
+# Sleeping chunks must read the same as awake ones once caught up
+
+def cellState(world):
+    return [(cell.handle, cell.energy, cell.membraneHealth, list(cell.geneHealth), cell.myTick)
+            for cell in world.cells if isinstance(cell, Cell)]
+
+def test_sleep_matches_awake_stats():
+    worlds = [World(3 ** 4, 300, seed=3, sleep=sleep) for sleep in (True, False)]
+    for world in worlds:
+        for _ in range(1200):
+            world.step(1/60)
+    asleep, awake = worlds
+    assert asleep.sleeping
+    asleep.catchUp()
+    assert asleep.population.census() == awake.population.census()
+    assert cellState(asleep) == cellState(awake)
+
+def test_store_get_pending_and_removed_handles():
+    world = World(3 ** 3, 0, seed=1)
+    particles = [world.spawnParticle(5, 5, "food", 2) for _ in range(3000)]
+    assert all(world.store.get(particle.handle) is None for particle in particles)
+    world.flush()
+    assert world.store.get(particles[-1].handle) is particles[-1]
+    world.despawn(particles[0])
+    world.flush()
+    assert world.store.get(particles[0].handle) is None
+    assert world.store.get(world.store.nextHandle) is None
+
+def test_dense_grid_follows_cells_in_place():
+    world = World(3 ** 3, 0, seed=1)
+    dense = world.grid.dense()
+    cells = [cell for cell in world.cells if isinstance(cell, Cell)]
+    for cell in cells[:5]:
+        world.removeCell(cell)
+    world.addCell(Cell(cells[0].x, cells[0].y))
+    world.addCell(Wall(cells[1].x, cells[1].y))
+    assert world.grid.dense() is dense
+
+    fresh = DenseGrid(world.grid)
+    gx, gy = np.meshgrid(np.arange(-2, 30), np.arange(-2, 30))
+    gx, gy = gx.ravel(), gy.ravel()
+    patched, rebuilt = dense.at(gx, gy), fresh.at(gx, gy)
+    assert [dense.solids[i] if i >= 0 else None for i in patched] == [fresh.solids[i] if i >= 0 else None for i in rebuilt]
+    assert np.array_equal(dense.isCell[patched[patched >= 0]], fresh.isCell[rebuilt[rebuilt >= 0]])
+
+def test_inside_column_follows_containers():
+    world = World(3 ** 3, 2000, seed=2)
+    for _ in range(300):
+        world.step(1/60)
+    store = world.store
+    expected = [particle.container.handle if particle.container else -1 for particle in store.proxies]
+    assert store.inside[:store.count].tolist() == expected
+    assert any(handle >= 0 for handle in expected)
+
+def test_compile_gene_documented_forms():
+    # Both forms from DNA.txt, plus gene range ends
+    assert compileGene("4;5(-1.3)").arg == (-1, 3)
+    assert compileGene("4;6c").arg == "c"
+    assert [end.text for end in compileGene("4;4(1;1.3;3)").arg] == ["1;1", "3;3"]
+    for text in ("4;6A", "4;6ab", "4;5(1.)", "4;5(-.3)", "3;3a"):
+        with pytest.raises(ValueError):
+            compileGene(text)
+
+def test_documented_forms_run():
+    world = World(3 ** 3, 0, seed=1, genes=compileGenome(["4;5(-1.3)", "5;6c", "4;4(1;1.3;3)", "1;1", "3;3"]))
+    for _ in range(600):
+        world.step(1/60)
+    assert world.population.cells